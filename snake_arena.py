@@ -0,0 +1,361 @@
+"""Арена: много змеек и яблок на одном поле.
+
+Все тела лежат в общей сетке владельцев: в клетке записан номер змейки,
+которая её занимает, или FREE. Поэтому тик для всех змеек - два прохода по
+змейкам без сравнения пар: сначала каждая выбирает голову и освобождает
+хвост, затем голова проверяется одним чтением сетки, маски камней и
+счётчика голов этого тика.
+"""
+from array import array
+from collections import deque
+from collections.abc import Set
+
+from snake_engine import (
+    GRID_HEIGHT, GRID_WIDTH, HIT_ROCK, HIT_SELF, ROCK_EVERY, STEPS, Board,
+    ObstacleLayer
+)
+
+# Значение сетки владельцев для клетки без змейки:
+FREE = -1
+
+# Сколько яблок лежит на поле арены:
+APPLES = 3
+
+# Сколько поворотов змейки ждёт своих тиков:
+TURN_QUEUE_SIZE = 3
+
+# Причины гибели на арене вдобавок к HIT_SELF и HIT_ROCK:
+HIT_SNAKE = 'hit_snake'
+HIT_HEAD = 'hit_head'
+
+
+class CellPool(Set):
+    """Набор клеток со случайным выбором за O(1): для яблок арены.
+
+    Клетки лежат в списке, а словарь помнит позицию каждой: удаление
+    ставит на место клетки последнюю из списка.
+    """
+
+    __slots__ = ('cells', 'slots')
+
+    def __init__(self, cells=()):
+        """Набор из клеток cells."""
+        self.cells = []
+        self.slots = {}
+        for cell in cells:
+            self.add(cell)
+
+    def __contains__(self, cell):
+        """Метод проверяющий, что клетка в наборе."""
+        return cell in self.slots
+
+    def __len__(self):
+        """Число клеток."""
+        return len(self.cells)
+
+    def __iter__(self):
+        """Метод перечисляющий клетки набора."""
+        return iter(self.cells)
+
+    @classmethod
+    def _from_iterable(cls, cells):
+        return set(cells)
+
+    def add(self, cell):
+        """Метод добавляющий клетку."""
+        if cell not in self.slots:
+            self.slots[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def discard(self, cell):
+        """Метод убирающий клетку, если она есть."""
+        slot = self.slots.pop(cell, None)
+        if slot is None:
+            return
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[slot] = last
+            self.slots[last] = slot
+
+    def choice(self, rng):
+        """Метод возвращающий случайную клетку или None для пустого набора."""
+        if not self.cells:
+            return None
+        return self.cells[rng.randrange(len(self.cells))]
+
+
+class ArenaSnake:
+    """Змейка арены: тело, направление, очередь поворотов и счёт."""
+
+    __slots__ = ('body', 'heading', 'turns', 'pilot', 'head', 'grows',
+                 'score', 'kills')
+
+    def __init__(self, pilot=None):
+        """Змейка вне поля до первого появления.
+
+        pilot - объект с методом choose(arena, snake_id), возвращающим
+        индекс направления в STEPS или None; без него змейкой управляют
+        повороты из очереди.
+        """
+        self.body = deque()
+        self.heading = 0
+        self.turns = deque(maxlen=TURN_QUEUE_SIZE)
+        self.pilot = pilot
+        # Голова, выбранная на текущем тике, и съест ли она яблоко
+        self.head = None
+        self.grows = False
+        self.score = 0
+        self.kills = 0
+
+
+class Arena(Board):
+    """Поле многих змеек по правилам игры из main().
+
+    Змейка движется на клетку за тик, растёт от яблока, каждое rock_every-е
+    яблоко её длины добавляет камень. Погибшая змейка появляется заново
+    длиной 1 (respawn=True) или покидает арену; камни и яблоки остаются.
+    Работа тика пропорциональна числу змеек, а не размеру поля.
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None,
+                 apples=APPLES, rock_every=ROCK_EVERY, level=None,
+                 respawn=True, track_changes=False):
+        """Создание поля с камнями уровня level и apples яблоками."""
+        super().__init__(width, height, rng)
+        cells = width * height
+        self.rock_every = rock_every
+        self.respawn = respawn
+        self.rocks = ObstacleLayer(cells, level)
+        self.owner = array('i', [FREE]) * cells
+        self.apples = CellPool()
+        self.snakes = {}
+        self.ticks = 0
+        # Клетки, изменившиеся с последнего вызова pop_changes
+        self.changes = set() if track_changes else None
+        self._next_id = 0
+        for _ in range(apples):
+            self._spawn_apple()
+
+    def is_free(self, cell):
+        """Метод проверяющий, что в клетке нет змейки, камня и яблока."""
+        return (self.owner[cell] == FREE and not self.rocks.mask[cell]
+                and cell not in self.apples)
+
+    def add_snake(self, pilot=None):
+        """Метод выпускающий на поле новую змейку и возвращающий её номер."""
+        snake_id = self._next_id
+        self._next_id += 1
+        self.snakes[snake_id] = ArenaSnake(pilot)
+        self._spawn(snake_id)
+        return snake_id
+
+    def remove_snake(self, snake_id):
+        """Метод убирающий змейку с поля."""
+        snake = self.snakes.pop(snake_id, None)
+        if snake is None:
+            return
+        self._clear_body(snake)
+        self._on_remove(snake_id)
+
+    def place_snake(self, snake_id, cells, heading):
+        """Метод ставящий змейку в клетки cells (голова первая)."""
+        snake = self.snakes[snake_id]
+        self._clear_body(snake)
+        snake.body = deque(cells)
+        snake.heading = heading
+        for cell in cells:
+            self.owner[cell] = snake_id
+            self._mark(cell)
+
+    def turn(self, snake_id, heading):
+        """Метод ставящий поворот змейки в очередь на ближайший тик."""
+        snake = self.snakes.get(snake_id)
+        if snake is not None and 0 <= heading < len(STEPS):
+            snake.turns.append(heading)
+
+    def step(self):
+        """Метод выполняющий тик для всех змеек и возвращающий их гибели.
+
+        Сначала все змейки выбирают голову и освобождают хвост, затем
+        каждая голова проверяется по сетке владельцев: порядок змеек не
+        влияет на исход, а две головы в одной клетке гибнут обе. Новые
+        яблоки и камни появляются, когда все головы уже на своих клетках,
+        а случайные клетки берутся по порядку номеров змеек. Гибели -
+        список пар (номер змейки, причина) по возрастанию номеров.
+        """
+        self.ticks += 1
+        for snake_id in sorted(snake_id for snake_id, snake
+                               in self.snakes.items() if not snake.body):
+            self._spawn(snake_id)
+        moving = [(snake_id, snake) for snake_id, snake in self.snakes.items()
+                  if snake.body]
+        heads = self._advance(moving)
+        deaths = []
+        eaters = []
+        for snake_id, snake in moving:
+            cause = self._settle(snake_id, snake, heads)
+            if cause is not None:
+                deaths.append((snake_id, cause))
+            elif snake.grows:
+                eaters.append((snake_id, snake))
+        for _, snake in sorted(eaters, key=lambda eater: eater[0]):
+            self._eat(snake)
+        deaths.sort()
+        for snake_id, _ in deaths:
+            if self.respawn:
+                self._clear_body(self.snakes[snake_id])
+                self._spawn(snake_id)
+            else:
+                self.remove_snake(snake_id)
+        return deaths
+
+    def pop_changes(self):
+        """Метод возвращающий и сбрасывающий набор изменившихся клеток."""
+        changes = self.changes
+        self.changes = set()
+        return changes
+
+    def _advance(self, moving):
+        neighbours = self.neighbours
+        owner = self.owner
+        apples = self.apples
+        heads = {}
+        for snake_id, snake in moving:
+            if snake.pilot is not None:
+                heading = snake.pilot.choose(self, snake_id)
+                if heading is not None:
+                    snake.turns.append(heading)
+            while snake.turns:
+                heading = snake.turns.popleft()
+                if heading != snake.heading ^ 1:
+                    snake.heading = heading
+                    break
+            head = neighbours[snake.heading][snake.body[0]]
+            snake.head = head
+            snake.grows = head in apples
+            if not snake.grows:
+                tail = snake.body.pop()
+                owner[tail] = FREE
+                self._mark(tail)
+            heads[head] = heads.get(head, 0) + 1
+        return heads
+
+    def _settle(self, snake_id, snake, heads):
+        head = snake.head
+        if heads[head] > 1:
+            return HIT_HEAD
+        owner = self.owner[head]
+        if owner == snake_id:
+            return HIT_SELF
+        if owner != FREE:
+            self.snakes[owner].kills += 1
+            return HIT_SNAKE
+        if self.rocks.mask[head]:
+            return HIT_ROCK
+        snake.body.appendleft(head)
+        self.owner[head] = snake_id
+        self._mark(head)
+        self._on_move(snake_id, head, snake.grows)
+        if snake.grows:
+            snake.score += 1
+            self.apples.discard(head)
+        return None
+
+    def _eat(self, snake):
+        if self.rock_every and len(snake.body) % self.rock_every == 0:
+            rock = self.random_free_cell()
+            if rock is not None:
+                self.rocks.add(rock)
+                self._mark(rock)
+                self._on_rock(rock)
+        self._spawn_apple()
+
+    def _spawn_apple(self):
+        cell = self.random_free_cell()
+        if cell is not None:
+            self.apples.add(cell)
+            self._mark(cell)
+            self._on_apple(cell)
+
+    def _spawn(self, snake_id):
+        snake = self.snakes[snake_id]
+        cell = self.random_free_cell()
+        if cell is None:
+            # Места нет: змейка ждёт за полем и пробует на следующем тике
+            self._on_remove(snake_id)
+            return
+        snake.body = deque([cell])
+        snake.heading = self.rng.randrange(len(STEPS))
+        snake.turns.clear()
+        self.owner[cell] = snake_id
+        self._mark(cell)
+        self._on_spawn(snake_id)
+
+    def _clear_body(self, snake):
+        owner = self.owner
+        for cell in snake.body:
+            owner[cell] = FREE
+            self._mark(cell)
+        snake.body.clear()
+
+    def _mark(self, cell):
+        if self.changes is not None:
+            self.changes.add(cell)
+
+    # Точки расширения для наследников: например, сервер кодирует здесь
+    # изменения тика для рассылки клиентам.
+
+    def _on_move(self, snake_id, head, grew):
+        pass
+
+    def _on_spawn(self, snake_id):
+        pass
+
+    def _on_remove(self, snake_id):
+        pass
+
+    def _on_apple(self, cell):
+        pass
+
+    def _on_rock(self, cell):
+        pass
+
+
+class GreedyPilot:
+    """Простой автопилот арены: идёт к выбранному яблоку, не врезаясь.
+
+    Из трёх ходов (без разворота) отбрасываются занятые клетки, а из
+    оставшихся берётся ближайший к цели с учётом перехода через край.
+    Решение - O(1), поэтому сотни таких змеек не замедляют тик.
+    """
+
+    def __init__(self):
+        """Пилот без цели: яблоко выберется на первом ходу."""
+        self.target = None
+
+    def choose(self, arena, snake_id):
+        """Метод возвращающий индекс направления в STEPS или None."""
+        snake = arena.snakes[snake_id]
+        if self.target not in arena.apples:
+            self.target = arena.apples.choice(arena.rng)
+        head = snake.body[0]
+        best = None
+        best_distance = None
+        for heading, table in enumerate(arena.neighbours):
+            cell = table[head]
+            if (heading == snake.heading ^ 1 or arena.owner[cell] != FREE
+                    or arena.rocks.mask[cell]):
+                continue
+            distance = self._distance(arena, cell)
+            if best is None or distance < best_distance:
+                best, best_distance = heading, distance
+        return best
+
+    def _distance(self, arena, cell):
+        if self.target is None:
+            return 0
+        x, y = arena.xy(cell)
+        target_x, target_y = arena.xy(self.target)
+        dx = abs(x - target_x)
+        dy = abs(y - target_y)
+        return (min(dx, arena.width - dx) + min(dy, arena.height - dy))
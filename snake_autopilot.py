@@ -0,0 +1,160 @@
+"""Автопилоты: управление змейкой без игрока.
+
+Автопилот - объект с методом choose(game), который возвращает направление
+на следующий тик. PathPilot идёт к яблоку по полю расстояний, посчитанному
+поиском в ширину; поле пересчитывается только когда меняются яблоко или
+камни. CyclePilot ведёт змейку по гамильтонову циклу поля, который строится
+один раз на каждый размер поля.
+"""
+from array import array
+from collections import deque
+from functools import lru_cache
+
+from snake_engine import STEPS, neighbour_table
+
+# Расстояние до недостижимой клетки:
+UNREACHABLE = float('inf')
+
+
+@lru_cache(maxsize=None)
+def hamiltonian_cycle(width, height):
+    """Функция возвращающая обход всех клеток поля по циклу.
+
+    Первая строка проходится слева направо, затем змейкой по строкам без
+    нулевого столбца, а по нулевому столбцу путь возвращается наверх.
+    Такой цикл есть, если высота поля чётная; иначе строится по столбцам.
+    """
+    if height % 2:
+        if width % 2:
+            raise ValueError('Для цикла нужна хотя бы одна чётная сторона')
+        # Клетка c транспонированного поля - это (c // height, c % height)
+        return tuple(cell % height * width + cell // height
+                     for cell in hamiltonian_cycle(height, width))
+    cycle = list(range(width))
+    for y in range(1, height):
+        xs = range(width - 1, 0, -1) if y % 2 else range(1, width)
+        cycle.extend(y * width + x for x in xs)
+    cycle.extend(y * width for y in range(height - 1, 0, -1))
+    return tuple(cycle)
+
+
+@lru_cache(maxsize=None)
+def cycle_directions(width, height):
+    """Функция возвращающая индекс хода в STEPS вдоль цикла для всех клеток."""
+    cycle = hamiltonian_cycle(width, height)
+    neighbours = neighbour_table(width, height)
+    directions = bytearray(width * height)
+    for index, cell in enumerate(cycle):
+        following = cycle[(index + 1) % len(cycle)]
+        for heading, table in enumerate(neighbours):
+            if table[cell] == following:
+                directions[cell] = heading
+                break
+    return bytes(directions)
+
+
+def distance_field(game, target):
+    """Функция считающая поиском в ширину шаги до target в обход камней.
+
+    Возвращает массив расстояний по клеткам, -1 - клетка недостижима.
+    """
+    neighbours = game.neighbours
+    rocks = game.rocks.mask
+    distances = array('i', [-1]) * (game.width * game.height)
+    distances[target] = 0
+    queue = deque([target])
+    while queue:
+        cell = queue.popleft()
+        distance = distances[cell] + 1
+        for table in neighbours:
+            neighbour = table[cell]
+            if distances[neighbour] < 0 and not rocks[neighbour]:
+                distances[neighbour] = distance
+                queue.append(neighbour)
+    return distances
+
+
+def is_blocked(game, cell):
+    """Функция проверяющая, что ход в cell закончится столкновением."""
+    if game.rocks.mask[cell]:
+        return True
+    # В клетку хвоста можно: он уйдёт на этом же ходу
+    return bool(game.occupied[cell]) and cell != game.body[-1]
+
+
+def _moves(game):
+    """Разрешённые ходы из головы: (индекс в STEPS, клетка) без разворота."""
+    head = game.head
+    back = game.heading ^ 1
+    return [(heading, table[head])
+            for heading, table in enumerate(game.neighbours)
+            if heading != back]
+
+
+class PathPilot:
+    """Автопилот, идущий к яблоку кратчайшим путём."""
+
+    def __init__(self):
+        """Пустой кэш поля расстояний."""
+        self.distances = None
+        self._key = None
+
+    def choose(self, game):
+        """Метод выбирающий ход с наименьшим расстоянием до яблока."""
+        key = (game.apple, len(game.rocks), game.width, game.height)
+        if key != self._key:
+            self._key = key
+            self.distances = (None if game.apple is None
+                              else distance_field(game, game.apple))
+        distances = self.distances
+        best = game.heading
+        best_score = None
+        for heading, cell in _moves(game):
+            if is_blocked(game, cell):
+                continue
+            distance = UNREACHABLE
+            if distances is not None and distances[cell] >= 0:
+                distance = distances[cell]
+            # При равенстве расстояний предпочитаем не поворачивать
+            score = (distance, heading != game.heading)
+            if best_score is None or score < best_score:
+                best, best_score = heading, score
+        return STEPS[best]
+
+
+class CyclePilot:
+    """Автопилот, идущий по гамильтонову циклу и не врезающийся в себя.
+
+    Камень на цикле разрывает обход, и змейка начинает ходить по кругу в
+    его части. Поэтому, если ход по циклу заблокирован, до следующего
+    яблока змейку ведёт запасной PathPilot, а затем она возвращается на цикл.
+    На поле с двумя нечётными сторонами цикла нет, и там змейку всё время
+    ведёт PathPilot.
+    """
+
+    def __init__(self):
+        """Создание запасного автопилота для обхода камней."""
+        self.fallback = PathPilot()
+        self._detour_length = None
+
+    def choose(self, game):
+        """Метод возвращающий следующий ход по циклу."""
+        if (game.length == self._detour_length
+                or game.width % 2 and game.height % 2):
+            return self.fallback.choose(game)
+        self._detour_length = None
+        heading = cycle_directions(game.width, game.height)[game.head]
+        for move, cell in _moves(game):
+            if move == heading and not is_blocked(game, cell):
+                return STEPS[heading]
+        # Сразу после сброса змейка может смотреть против цикла,
+        # а на цикле может лежать камень.
+        self._detour_length = game.length
+        return self.fallback.choose(game)
+
+
+# Автопилоты по именам, например для запуска из командной строки:
+AUTOPILOTS = {
+    'path': PathPilot,
+    'cycle': CyclePilot,
+}
@@ -0,0 +1,162 @@
+"""Пакетный движок: тысячи партий змейки в массивах NumPy.
+
+Правила совпадают с snake_engine.GameState.step, но один вызов step
+продвигает на тик сразу все доски. Клетка кодируется индексом y * width + x,
+направление - индексом в snake_engine.STEPS.
+"""
+import numpy as np
+
+from snake_engine import (
+    ATE, GRID_HEIGHT, GRID_WIDTH, HIT_ROCK, HIT_SELF, MOVED, RIGHT,
+    ROCK_EVERY, STEPS
+)
+
+# Коды событий в массиве, который возвращает BatchGame.step:
+EVENTS = (MOVED, ATE, HIT_SELF, HIT_ROCK)
+MOVED_CODE, ATE_CODE, HIT_SELF_CODE, HIT_ROCK_CODE = range(len(EVENTS))
+
+# Смещения и противоположные направления по индексам STEPS:
+STEP_DX = np.array([dx for dx, _ in STEPS], dtype=np.int32)
+STEP_DY = np.array([dy for _, dy in STEPS], dtype=np.int32)
+OPPOSITE = np.array([STEPS.index((-dx, -dy)) for dx, dy in STEPS],
+                    dtype=np.int8)
+
+# Отсутствие команды в массиве действий:
+NO_ACTION = -1
+
+
+class BatchGame:
+    """Набор из n независимых досок, которые ходят одновременно."""
+
+    def __init__(self, n, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        """Создание массивов состояния и расстановка всех досок."""
+        self.n = n
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.start_cell = (height // 2 - 1) * width + width // 2 - 1
+        self.rng = np.random.default_rng(seed)
+        self.rows = np.arange(n)
+        # Кольцевые буферы тел: голова в head_index, хвост через length - 1
+        self.body = np.zeros((n, self.cells), dtype=np.int32)
+        self.head_index = np.zeros(n, dtype=np.int32)
+        self.length = np.ones(n, dtype=np.int32)
+        # Сколько сегментов лежит в каждой клетке каждой доски
+        self.occupancy = np.zeros((n, self.cells), dtype=np.uint16)
+        self.rocks = np.zeros((n, self.cells), dtype=bool)
+        self.direction = np.full(n, STEPS.index(RIGHT), dtype=np.int8)
+        self.apple = np.zeros(n, dtype=np.int32)
+        self.last = np.full(n, -1, dtype=np.int32)
+        # Итоги последнего тика: какие доски съели яблоко и где вырос камень
+        self.ate = np.zeros(n, dtype=bool)
+        self.new_rock = np.full(n, -1, dtype=np.int32)
+        self.ticks = 0
+        self.apple[:] = -1
+        self._place_snakes(self.rows)
+        self.apple[:] = self.random_free_cells(self.rows)
+
+    @property
+    def head(self):
+        """Клетки голов всех досок."""
+        return self.body[self.rows, self.head_index]
+
+    @property
+    def tail(self):
+        """Клетки хвостов всех досок."""
+        tail_index = (self.head_index + self.length - 1) % self.cells
+        return self.body[self.rows, tail_index]
+
+    def random_cells(self, count):
+        """Метод возвращающий count случайных клеток поля."""
+        return self.rng.integers(0, self.cells, size=count, dtype=np.int32)
+
+    def random_free_cells(self, boards):
+        """Метод выбирающий по пустой клетке на каждой доске или -1."""
+        free = (self.occupancy[boards] == 0) & ~self.rocks[boards]
+        apple = self.apple[boards]
+        has_apple = apple >= 0
+        free[has_apple.nonzero()[0], apple[has_apple]] = False
+        # Максимум случайных весов по пустым клеткам - равномерный выбор
+        weights = self.rng.random(free.shape)
+        weights[~free] = -1
+        cells = weights.argmax(axis=1).astype(np.int32)
+        cells[~free.any(axis=1)] = -1
+        return cells
+
+    def positions(self, board):
+        """Метод возвращающий клетки тела доски от головы."""
+        start = self.head_index[board]
+        indexes = (start + np.arange(self.length[board])) % self.cells
+        return self.body[board, indexes].tolist()
+
+    def step(self, actions=None):
+        """Метод выполняющий тик на всех досках и возвращающий коды событий."""
+        rows = self.rows
+        self.ticks += 1
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            turn = ((actions != NO_ACTION)
+                    & (actions != OPPOSITE[self.direction]))
+            self.direction = np.where(turn, actions, self.direction)
+
+        head = self.head
+        x = (head % self.width + STEP_DX[self.direction]) % self.width
+        y = (head // self.width + STEP_DY[self.direction]) % self.height
+        head = y * self.width + x
+
+        tail = self.tail
+        self.occupancy[rows, tail] -= 1
+        collided = self.occupancy[rows, head] > 0
+        self.head_index = (self.head_index - 1) % self.cells
+        self.body[rows, self.head_index] = head
+        self.occupancy[rows, head] += 1
+        self.last = tail
+
+        events = np.full(self.n, MOVED_CODE, dtype=np.int8)
+        events[collided] = HIT_SELF_CODE
+        ate = ~collided & (head == self.apple)
+        self.ate = ate
+        self.new_rock[:] = -1
+        self._eat(ate.nonzero()[0])
+        events[ate] = ATE_CODE
+
+        hit_rock = ~collided & self.rocks[rows, head]
+        events[hit_rock] = HIT_ROCK_CODE
+        self.reset(collided | hit_rock)
+        return events
+
+    def reset(self, mask):
+        """Метод возвращающий в исходное состояние доски из маски."""
+        boards = np.asarray(mask).nonzero()[0]
+        if not boards.size:
+            return
+        self.occupancy[boards] = 0
+        self.rocks[boards] = False
+        self._place_snakes(boards)
+        self.direction[boards] = self.rng.integers(0, len(STEPS),
+                                                   size=boards.size)
+
+    def _eat(self, boards):
+        if not boards.size:
+            return
+        # Возвращаем хвост, снятый этим ходом; буфер не может переполниться
+        grow = boards[self.length[boards] < self.cells]
+        tail = self.last[grow]
+        tail_index = (self.head_index[grow] + self.length[grow]) % self.cells
+        self.body[grow, tail_index] = tail
+        self.occupancy[grow, tail] += 1
+        self.length[grow] += 1
+        self.last[grow] = -1
+
+        spawn = boards[self.length[boards] % ROCK_EVERY == 0]
+        self.new_rock[spawn] = self.random_free_cells(spawn)
+        placed = spawn[self.new_rock[spawn] >= 0]
+        self.rocks[placed, self.new_rock[placed]] = True
+        self.apple[boards] = self.random_free_cells(boards)
+
+    def _place_snakes(self, boards):
+        self.head_index[boards] = 0
+        self.length[boards] = 1
+        self.last[boards] = -1
+        self.body[boards, 0] = self.start_cell
+        self.occupancy[boards, self.start_cell] = 1
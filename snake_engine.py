@@ -0,0 +1,469 @@
+"""Игровая логика змейки без зависимости от pygame.
+
+Клетка поля - целое число y * width + x, а ход делается по готовой таблице
+соседей, так что переход через край не требует ни проверок, ни деления.
+Состояние лежит в __slots__ и плоских буферах array/bytearray: его дёшево
+копировать для поиска и снимков. Движок можно запускать без окна: для ботов,
+тестов и аналитики.
+"""
+import re
+from abc import ABC, abstractmethod
+from array import array
+from collections import deque
+from collections.abc import Set
+from functools import lru_cache
+from random import Random
+
+# Размеры игрового поля в клетках:
+GRID_WIDTH = 32
+GRID_HEIGHT = 24
+
+# Скорость движения змейки (логических тиков в секунду):
+SPEED = 10
+
+# Направления движения:
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+# Варианты движения; противоположное направление - соседний индекс: i ^ 1
+STEPS = [UP, DOWN, LEFT, RIGHT]
+
+# Каждое какое по счёту съеденное яблоко добавляет камень:
+ROCK_EVERY = 4
+
+# Сколько случайных клеток проверить, прежде чем искать свободную перебором:
+FREE_TRIES = 32
+
+# События, которые возвращает GameState.step:
+MOVED = 'moved'
+ATE = 'ate'
+HIT_SELF = 'hit_self'
+HIT_ROCK = 'hit_rock'
+
+
+# Ненулевые байты упакованной маски и номера единичных битов каждого байта
+_NONZERO = re.compile(rb'[^\x00]')
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1)
+         for byte in range(256)]
+
+
+@lru_cache(maxsize=None)
+def neighbour_table(width, height):
+    """Функция возвращающая соседей всех клеток поля по каждому из STEPS.
+
+    table[direction][cell] - клетка, в которую ведёт ход direction (индекс
+    в STEPS) из cell с учётом перехода через край.
+    """
+    cells = width * height
+    up = array('i', range(cells - width, cells))
+    up += array('i', range(cells - width))
+    down = array('i', range(width, cells))
+    down += array('i', range(width))
+    left = array('i')
+    right = array('i')
+    for row in range(0, cells, width):
+        left.append(row + width - 1)
+        left += array('i', range(row, row + width - 1))
+        right += array('i', range(row + 1, row + width))
+        right.append(row)
+    return up, down, left, right
+
+
+class ObstacleLayer(Set):
+    """Камни поля: маска с байтом на клетку и число камней.
+
+    Ведёт себя как множество клеток, но проверка клетки - это чтение байта,
+    а копия и загрузка уровня - копирование маски целиком.
+    """
+
+    __slots__ = ('mask', 'count')
+
+    def __init__(self, cells, mask=None):
+        """Пустой слой на cells клеток или слой по готовой маске."""
+        self.mask = bytearray(cells)
+        self.count = 0
+        if mask is not None:
+            self.load(mask)
+
+    def __contains__(self, cell):
+        """Метод проверяющий, что в клетке камень."""
+        return cell is not None and self.mask[cell] != 0
+
+    def __len__(self):
+        """Число камней."""
+        return self.count
+
+    def __iter__(self):
+        """Метод перечисляющий клетки с камнями по возрастанию."""
+        mask = self.mask
+        cell = mask.find(1)
+        while cell >= 0:
+            yield cell
+            cell = mask.find(1, cell + 1)
+
+    @classmethod
+    def _from_iterable(cls, cells):
+        # Операции множеств (&, |, -) возвращают обычное множество
+        return set(cells)
+
+    def add(self, cell):
+        """Метод ставящий камень в клетку."""
+        if not self.mask[cell]:
+            self.mask[cell] = 1
+            self.count += 1
+
+    def load(self, mask):
+        """Метод заменяющий все камни маской уровня за одно копирование."""
+        self.mask[:] = mask
+        self.count = self.mask.count(1)
+
+    def copy(self):
+        """Метод возвращающий независимую копию слоя."""
+        return ObstacleLayer(len(self.mask), self.mask)
+
+    def to_bits(self):
+        """Метод упаковывающий маску по биту на клетку."""
+        packed = bytearray((len(self.mask) + 7) // 8)
+        for cell in self:
+            packed[cell >> 3] |= 1 << (cell & 7)
+        return bytes(packed)
+
+    @classmethod
+    def from_bits(cls, cells, packed):
+        """Метод создающий слой из маски, упакованной to_bits.
+
+        Нулевые байты пропускает регулярное выражение, поэтому время
+        зависит от числа камней, а не от размера поля.
+        """
+        layer = cls(cells)
+        mask = layer.mask
+        for match in _NONZERO.finditer(packed):
+            base = match.start() << 3
+            for bit in _BITS[match.group()[0]]:
+                mask[base + bit] = 1
+        layer.count = mask.count(1)
+        return layer
+
+
+class Board(ABC):
+    """Поле с переходом через край: клетки, координаты и случайный выбор.
+
+    Общая основа GameState и арены; наследник решает, какая клетка
+    свободна, в методе is_free.
+    """
+
+    __slots__ = ('width', 'height', 'rng', 'neighbours')
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None):
+        """Поле width x height с генератором rng или новым Random."""
+        self.width = width
+        self.height = height
+        self.rng = rng if rng is not None else Random()
+        self.neighbours = neighbour_table(width, height)
+
+    def cell(self, x, y):
+        """Метод возвращающий клетку по координатам с переходом через край."""
+        return y % self.height * self.width + x % self.width
+
+    def xy(self, cell):
+        """Метод возвращающий координаты (x, y) клетки."""
+        y, x = divmod(cell, self.width)
+        return x, y
+
+    def random_cell(self):
+        """Метод возвращающий случайную клетку поля."""
+        return self.rng.randrange(self.width * self.height)
+
+    def random_free_cell(self):
+        """Метод возвращающий случайную пустую клетку или None.
+
+        Пока поле не заполнено, хватает нескольких случайных проб, и время
+        не зависит от размера поля; перебор - только для почти полного поля.
+        """
+        cells = self.width * self.height
+        for _ in range(FREE_TRIES):
+            cell = self.rng.randrange(cells)
+            if self.is_free(cell):
+                return cell
+        free = [cell for cell in range(cells) if self.is_free(cell)]
+        return self.rng.choice(free) if free else None
+
+    @abstractmethod
+    def is_free(self, cell):
+        """Метод проверяющий, что клетка пуста."""
+
+
+class GameState(Board):
+    """Состояние одной партии и правила перехода между тиками."""
+
+    __slots__ = (
+        'rock_every', 'level', 'changes', 'ticks', 'rocks', 'apple',
+        'new_rock', 'heading', 'body', 'occupied', 'length', 'last', '_free',
+        '_free_slot',
+    )
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None,
+                 track_changes=False, rock_every=ROCK_EVERY, level=None):
+        """Создание поля, змейки в центре и первого яблока.
+
+        rock_every - каждое какое яблоко добавляет камень, 0 - без камней,
+        level - маска постоянных камней уровня из snake_levels или None.
+        """
+        super().__init__(width, height, rng)
+        self.rock_every = rock_every
+        self.level = level
+        # Клетки, изменившиеся с последнего вызова pop_changes
+        self.changes = set() if track_changes else None
+        self.ticks = 0
+        self.rocks = ObstacleLayer(width * height)
+        self.apple = None
+        # Камень, появившийся на последнем тике, или None
+        self.new_rock = None
+        # Индекс свободных клеток: список и позиция каждой клетки в нём
+        cells = width * height
+        self._free = array('i', range(cells))
+        self._free_slot = array('i', range(cells))
+        # Счётчик сегментов змейки в каждой клетке
+        self.occupied = bytearray(cells)
+        self.body = deque()
+        self._load_level()
+        self._place_snake([self.start_cell])
+        self.heading = STEPS.index(RIGHT)
+        self.place_apple(self.random_free_cell())
+
+    @property
+    def start_cell(self):
+        """Клетка, в которой появляется змейка."""
+        return self.cell(self.width // 2 - 1, self.height // 2 - 1)
+
+    @property
+    def head(self):
+        """Клетка головы змейки."""
+        return self.body[0]
+
+    @property
+    def direction(self):
+        """Направление движения из STEPS."""
+        return STEPS[self.heading]
+
+    def random_free_cell(self):
+        """Метод возвращающий случайную пустую клетку или None за O(1)."""
+        if not self._free:
+            return None
+        return self._free[self.rng.randrange(len(self._free))]
+
+    def is_free(self, cell):
+        """Метод проверяющий, что в клетке нет змейки, камня и яблока."""
+        return self._free_slot[cell] >= 0
+
+    def turn(self, direction):
+        """Метод меняющий направление, если это не разворот назад."""
+        heading = STEPS.index(direction)
+        if heading == self.heading ^ 1:
+            return False
+        self.heading = heading
+        return True
+
+    def step(self, action=None):
+        """Метод выполняющий один тик игры и возвращающий его событие."""
+        if action is not None:
+            self.turn(action)
+        self.ticks += 1
+        self.new_rock = None
+        body = self.body
+        head = self.neighbours[self.heading][body[0]]
+
+        tail = body.pop()
+        self.occupied[tail] -= 1
+        self._give(tail)
+        collided = self.occupied[head]
+        body.appendleft(head)
+        self.occupied[head] += 1
+        self._take(head)
+        self.last = tail
+        self._mark(head)
+        self._mark(tail)
+
+        if collided:
+            self.reset()
+            return HIT_SELF
+        event = MOVED
+        if head == self.apple:
+            self.grow()
+            if self.rock_every and self.length % self.rock_every == 0:
+                rock = self.random_free_cell()
+                if rock is not None:
+                    self.add_rock(rock)
+                    self.new_rock = rock
+            self.place_apple(self.random_free_cell())
+            event = ATE
+        if self.rocks.mask[head]:
+            self.reset()
+            return HIT_ROCK
+        return event
+
+    def grow(self):
+        """Метод возвращающий змейке сегмент, удалённый последним ходом."""
+        if self.last is None:
+            return
+        self.body.append(self.last)
+        self.occupied[self.last] += 1
+        self._take(self.last)
+        self.length += 1
+        self.last = None
+
+    def add_rock(self, cell):
+        """Метод добавляющий камень на поле."""
+        self.rocks.add(cell)
+        self._take(cell)
+        self._mark(cell)
+
+    def clear_rocks(self):
+        """Метод убирающий все камни с поля."""
+        rocks = self.rocks
+        self.rocks = ObstacleLayer(self.width * self.height)
+        for cell in rocks:
+            self._give(cell)
+            self._mark(cell)
+
+    def place_apple(self, cell):
+        """Метод перекладывающий яблоко в клетку cell."""
+        old = self.apple
+        self.apple = cell
+        if old is not None:
+            self._give(old)
+            self._mark(old)
+        if cell is not None:
+            self._take(cell)
+            self._mark(cell)
+
+    def place_snake(self, cells, direction):
+        """Метод ставящий змейку в клетки cells (голова первая)."""
+        self._remove_snake()
+        self._place_snake(cells)
+        self.heading = STEPS.index(direction)
+
+    def reset(self):
+        """Метод возвращающий змейку в исходное состояние и убирающий камни."""
+        self._remove_snake()
+        self.clear_rocks()
+        self._load_level()
+        self._place_snake([self.start_cell])
+        self.heading = STEPS.index(self.rng.choice(STEPS))
+
+    @property
+    def free_cells(self):
+        """Свободные клетки в порядке, по которому выбирается случайная."""
+        return self._free
+
+    def restore(self, ticks, rocks, body, heading, apple, last=None,
+                free=None):
+        """Метод переводящий партию в сохранённое состояние: для снимков.
+
+        rocks - клетки камней вместе с камнями уровня, body - клетки змейки
+        от головы, heading - индекс направления в STEPS, free - порядок
+        свободных клеток из free_cells, чтобы следующие случайные клетки
+        совпали с исходной партией.
+        """
+        self._remove_snake()
+        self.clear_rocks()
+        self.place_apple(None)
+        for cell in rocks:
+            self.add_rock(cell)
+        self._place_snake(body)
+        self.heading = heading
+        self.place_apple(apple)
+        self.ticks = ticks
+        self.last = last
+        self.new_rock = None
+        if free is None:
+            return
+        if len(free) != len(self._free):
+            raise ValueError('Порядок свободных клеток не совпадает с полем')
+        self._free = array('i', free)
+        self._free_slot = array('i', [-1]) * len(self._free_slot)
+        for slot, cell in enumerate(self._free):
+            self._free_slot[cell] = slot
+
+    def pop_changes(self):
+        """Метод возвращающий и сбрасывающий набор изменившихся клеток."""
+        changes = self.changes
+        self.changes = set()
+        return changes
+
+    def copy(self):
+        """Метод возвращающий независимую копию партии для поиска и снимков.
+
+        Буферы копируются целиком без обхода клеток, таблица соседей общая.
+        Изменения в копии не отслеживаются.
+        """
+        game = GameState.__new__(GameState)
+        game.width = self.width
+        game.height = self.height
+        game.rng = Random()
+        game.rng.setstate(self.rng.getstate())
+        game.rock_every = self.rock_every
+        game.level = self.level
+        game.changes = None
+        game.ticks = self.ticks
+        game.rocks = self.rocks.copy()
+        game.apple = self.apple
+        game.new_rock = self.new_rock
+        game.heading = self.heading
+        game.neighbours = self.neighbours
+        game.body = deque(self.body)
+        game.occupied = bytearray(self.occupied)
+        game.length = self.length
+        game.last = self.last
+        game._free = array('i', self._free)
+        game._free_slot = array('i', self._free_slot)
+        return game
+
+    def _load_level(self):
+        if self.level is None:
+            return
+        self.rocks.load(self.level)
+        for cell in self.rocks:
+            self._take(cell)
+            self._mark(cell)
+
+    def _place_snake(self, cells):
+        self.body = deque(cells)
+        for cell in self.body:
+            self.occupied[cell] += 1
+            self._take(cell)
+            self._mark(cell)
+        self.length = len(self.body)
+        self.last = None
+
+    def _remove_snake(self):
+        occupied = self.occupied
+        for cell in self.body:
+            occupied[cell] = 0
+        for cell in self.body:
+            self._give(cell)
+            self._mark(cell)
+
+    def _take(self, cell):
+        # Удаление за O(1): на место клетки ставим последнюю из списка
+        slot = self._free_slot[cell]
+        if slot < 0:
+            return
+        self._free_slot[cell] = -1
+        last = self._free.pop()
+        if last != cell:
+            self._free[slot] = last
+            self._free_slot[last] = slot
+
+    def _give(self, cell):
+        if (self._free_slot[cell] >= 0 or self.occupied[cell]
+                or self.rocks.mask[cell] or cell == self.apple):
+            return
+        self._free_slot[cell] = len(self._free)
+        self._free.append(cell)
+
+    def _mark(self, cell):
+        if self.changes is not None:
+            self.changes.add(cell)
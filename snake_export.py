@@ -0,0 +1,365 @@
+"""Выгрузка партии в картинки без окна: PNG-кадры или анимированный GIF.
+
+Партию ведёт автопилот, а кадры рисуют те же draw-методы, что и в игре,
+только на поверхность в памяти и без clock.tick: кадр готов сразу после
+тика. Изменившаяся часть кадра копируется в свободную поверхность из
+небольшого пула, и поток-кодировщик читает её через pygame.surfarray.pixels3d
+без дополнительного копирования. Сжатие (zlib и NumPy) отпускает GIL, поэтому
+потоки работают параллельно с отрисовкой. Готовые кадры пишутся по порядку.
+
+GIF хранит только прямоугольник изменений каждого кадра, а LZW в нём
+сжимает отрезки одного цвета: словарь каждого отрезка растёт цепочкой
+"c", "cc", "ccc", и отрезок из L пикселей занимает около sqrt(2L) кодов.
+Такие коды считаются операциями NumPy над целым кадром, без цикла по
+пикселям, который держал бы GIL.
+
+Запуск: `python snake_export.py game.gif --ticks 600 --pilot cycle`.
+"""
+import argparse
+import os
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from random import Random
+
+import numpy as np
+import pygame
+
+import the_snake
+from snake_autopilot import AUTOPILOTS
+from snake_engine import GameState
+from snake_levels import generate_level
+
+# Потоков-кодировщиков по умолчанию:
+EXPORT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Сколько поверхностей пула приходится на поток: пока один кадр
+# кодируется, следующий уже копируется
+SLOTS_PER_WORKER = 2
+
+# Уровень сжатия zlib для PNG:
+PNG_LEVEL = 6
+
+# Самый длинный отрезок одного цвета в LZW кадра GIF: на более длинном
+# словарь дорос бы до 512 кодов, и код перестал бы быть 9-битным
+LZW_RUN = 32_000
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_LZW_MIN_BITS = 8
+_LZW_CLEAR = 1 << _LZW_MIN_BITS
+_LZW_END = _LZW_CLEAR + 1
+_LZW_BITS = np.arange(_LZW_MIN_BITS + 1, dtype=np.uint16)
+
+
+def encode_png(pixels):
+    """Функция кодирующая массив (высота, ширина, 3) в файл PNG."""
+    height, width, _ = pixels.shape
+    # Каждая строка начинается с байта фильтра 0 - без фильтра
+    rows = np.zeros((height, width * 3 + 1), np.uint8)
+    rows[:, 1:] = pixels.reshape(height, width * 3)
+
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+
+    return b''.join((
+        _PNG_SIGNATURE,
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        chunk(b'IDAT', zlib.compress(rows, PNG_LEVEL)),
+        chunk(b'IEND', b''),
+    ))
+
+
+class GifPalette:
+    """Палитра GIF: точные цвета игры и куб 6x6x6 для остальных."""
+
+    def __init__(self, colors):
+        """Построение палитры из цветов игры (не больше 40)."""
+        exact = sorted(set(colors))
+        if len(exact) > 256 - 216:
+            raise ValueError('Слишком много точных цветов палитры')
+        levels = [round(level * 255 / 5) for level in range(6)]
+        cube = [(r, g, b) for r in levels for g in levels for b in levels]
+        table = exact + cube + [(0, 0, 0)] * (256 - len(exact) - len(cube))
+        self.table = bytes(value for color in table for value in color)
+        self.keys = np.array([r << 16 | g << 8 | b for r, g, b in exact],
+                             np.uint32)
+        self.offset = len(exact)
+
+    def indices(self, pixels):
+        """Метод переводящий массив (..., 3) в индексы палитры."""
+        channels = pixels.astype(np.uint32)
+        keys = channels[..., 0] << 16 | channels[..., 1] << 8
+        keys |= channels[..., 2]
+        found = np.searchsorted(self.keys, keys)
+        found[found == len(self.keys)] = 0
+        exact = self.keys[found] == keys
+        # Ближайший узел куба: 0..5 по каждому каналу
+        steps = (channels * 5 + 127) // 255
+        cube = (self.offset + steps[..., 0] * 36 + steps[..., 1] * 6
+                + steps[..., 2])
+        return np.where(exact, found, cube).astype(np.uint8)
+
+
+def _run_codes(pixels):
+    """Функция кодирующая пиксели отрезками: очистка словаря и цепочка.
+
+    После кода очистки и кода цвета c каждый следующий код равен
+    очередному свободному номеру словаря и даёт на пиксель больше
+    предыдущего: 1 + 2 + ... + n пикселей. Остаток r <= n - уже
+    известная строка из r пикселей.
+    """
+    count = len(pixels)
+    starts = np.union1d(np.flatnonzero(pixels[1:] != pixels[:-1]) + 1,
+                        np.arange(0, count, LZW_RUN))
+    lengths = np.diff(np.append(starts, count))
+    chain = ((np.sqrt(8 * lengths + 1) - 1) // 2).astype(np.int64)
+    # Поправка на округление корня
+    chain -= chain * (chain + 1) // 2 > lengths
+    chain += (chain + 1) * (chain + 2) // 2 <= lengths
+    rest = lengths - chain * (chain + 1) // 2
+    sizes = chain + 1 + (rest > 0)
+    run = np.repeat(np.arange(len(starts)), sizes)
+    step = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    colors = pixels[starts][run]
+    codes = (_LZW_CLEAR + step).astype(np.uint16)
+    codes[step == 0] = _LZW_CLEAR
+    codes[step == 1] = colors[step == 1]
+    tail = step == chain[run] + 1
+    rest = rest[run][tail]
+    codes[tail] = np.where(rest == 1, colors[tail], _LZW_CLEAR + rest)
+    return codes
+
+
+def encode_gif_frame(indices, left, top, delay):
+    """Функция кодирующая кадр GIF из индексов палитры (высота, ширина).
+
+    Кадр ложится на холст в точку (left, top), delay - пауза в сотых
+    долях секунды.
+    """
+    height, width = indices.shape
+    codes = np.append(_run_codes(indices.ravel()), _LZW_END)
+    bits = (codes[:, None] >> _LZW_BITS & 1).astype(np.uint8)
+    data = np.packbits(bits.ravel(), bitorder='little').tobytes()
+    blocks = b''.join(
+        bytes((len(data[start:start + 255]),)) + data[start:start + 255]
+        for start in range(0, len(data), 255)
+    )
+    return b''.join((
+        # Управление кадром: не стирать прошлый кадр, пауза delay
+        struct.pack('<3sBHBB', b'\x21\xf9\x04', 0x04, delay, 0, 0),
+        struct.pack('<BHHHHB', 0x2C, left, top, width, height, 0),
+        bytes((_LZW_MIN_BITS,)), blocks, b'\x00',
+    ))
+
+
+def gif_header(width, height, palette):
+    """Функция возвращающая начало GIF: холст, палитру и повтор по кругу."""
+    return b''.join((
+        b'GIF89a',
+        struct.pack('<HHBBB', width, height, 0xF7, 0, 0),
+        palette.table,
+        b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00',
+    ))
+
+
+class FrameExporter(ABC):
+    """Пул кодировщиков кадров: копия в свободную поверхность и поток.
+
+    Кадров в работе не больше, чем поверхностей в пуле: если все заняты,
+    add ждёт самый старый кадр и записывает его, так что память не растёт.
+    """
+
+    def __init__(self, size, workers=EXPORT_WORKERS):
+        """Создание пула поверхностей размера size и потоков."""
+        self.size = size
+        self.pool = ThreadPoolExecutor(workers)
+        self.free = [pygame.Surface(size) for _ in
+                     range(workers * SLOTS_PER_WORKER)]
+        self.pending = deque()
+        self.frames = 0
+
+    def add(self, surface, rect=None):
+        """Метод отдающий кодировщику область rect кадра surface."""
+        rect = surface.get_rect() if rect is None else rect
+        if not self.free:
+            self._finish_oldest()
+        slot = self.free.pop()
+        slot.blit(surface, rect, rect)
+        future = self.pool.submit(self._encode, slot, rect, self.frames)
+        self.pending.append((future, slot))
+        self.frames += 1
+
+    def close(self):
+        """Метод дожидающийся всех кадров и закрывающий вывод."""
+        while self.pending:
+            self._finish_oldest()
+        self.pool.shutdown()
+
+    def _encode(self, slot, rect, index):
+        # Вид на пиксели поверхности без копии; блокировка снимется,
+        # когда массив исчезнет в конце функции
+        pixels = pygame.surfarray.pixels3d(slot)[
+            rect.left:rect.right, rect.top:rect.bottom
+        ].transpose(1, 0, 2)
+        return self.encode(pixels, rect, index)
+
+    def _finish_oldest(self):
+        future, slot = self.pending.popleft()
+        self.write(future.result())
+        self.free.append(slot)
+
+    @abstractmethod
+    def encode(self, pixels, rect, index):
+        """Метод кодирующий кадр в потоке пула: задают наследники."""
+
+    @abstractmethod
+    def write(self, data):
+        """Метод записывающий готовый кадр по порядку: задают наследники."""
+
+
+class PngSequence(FrameExporter):
+    """Кадры в отдельных файлах PNG: frame_00000.png и дальше."""
+
+    only_changes = False
+
+    def __init__(self, directory, size, workers=EXPORT_WORKERS):
+        """Создание каталога для кадров."""
+        super().__init__(size, workers)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.written = 0
+
+    def encode(self, pixels, rect, index):
+        """Метод кодирующий кадр целиком в PNG."""
+        return encode_png(pixels)
+
+    def write(self, data):
+        """Метод сохраняющий очередной кадр в файл."""
+        path = self.directory / f'frame_{self.written:05d}.png'
+        path.write_bytes(data)
+        self.written += 1
+
+
+class GifAnimation(FrameExporter):
+    """Анимированный GIF: каждый кадр - только прямоугольник изменений."""
+
+    only_changes = True
+
+    def __init__(self, path, size, delay, palette, workers=EXPORT_WORKERS):
+        """Открытие файла и запись заголовка с палитрой."""
+        super().__init__(size, workers)
+        self.delay = delay
+        self.palette = palette
+        self.file = open(path, 'wb')
+        self.file.write(gif_header(*size, palette))
+
+    def encode(self, pixels, rect, index):
+        """Метод кодирующий прямоугольник кадра в блок GIF."""
+        return encode_gif_frame(self.palette.indices(pixels), rect.left,
+                                rect.top, self.delay)
+
+    def write(self, data):
+        """Метод дописывающий кадр в файл."""
+        self.file.write(data)
+
+    def close(self):
+        """Метод дописывающий конец GIF и закрывающий файл."""
+        super().close()
+        self.file.write(b'\x3b')
+        self.file.close()
+
+
+def changed_rect(surface, rects):
+    """Функция объединяющая области изменений кадра в одну внутри surface.
+
+    Пустой кадр всё равно нужен для паузы, поэтому без изменений
+    возвращается один пиксель.
+    """
+    bounds = surface.get_rect()
+    if not rects:
+        return pygame.Rect(0, 0, 1, 1)
+    return pygame.Rect(rects[0]).unionall(rects[1:]).clip(bounds)
+
+
+def game_palette():
+    """Функция возвращающая палитру GIF с цветами игры."""
+    return GifPalette((
+        the_snake.BOARD_BACKGROUND_COLOR, the_snake.BORDER_COLOR,
+        the_snake.APPLE_COLOR, the_snake.SNAKE_COLOR, the_snake.ROCK_COLOR,
+        the_snake.OVERLAY_COLOR, *the_snake.ARENA_COLORS,
+    ))
+
+
+def open_exporter(path, size, speed=the_snake.SPEED,
+                  workers=EXPORT_WORKERS):
+    """Функция выбирающая формат по пути: .gif - анимация, иначе каталог PNG.
+
+    speed - тиков в секунду, из неё берётся пауза между кадрами GIF.
+    """
+    if str(path).lower().endswith('.gif'):
+        return GifAnimation(path, size, round(100 / speed), game_palette(),
+                            workers)
+    return PngSequence(path, size, workers)
+
+
+def export_game(path, ticks, pilot='path', seed=0, level=None,
+                speed=the_snake.SPEED, workers=EXPORT_WORKERS):
+    """Функция играющая ticks тиков автопилотом и выгружающая кадры в path.
+
+    Окно не открывается: кадры рисуются на поверхность в памяти, поэтому
+    хватает видеодрайвера dummy. Возвращает число выгруженных кадров.
+    """
+    width, height = the_snake.GRID_WIDTH, the_snake.GRID_HEIGHT
+    game = GameState(width, height, rng=Random(seed), track_changes=True,
+                     level=(None if level is None
+                            else generate_level(width, height, level)))
+    surface = pygame.Surface((the_snake.SCREEN_WIDTH,
+                              the_snake.SCREEN_HEIGHT))
+    snake = the_snake.Snake(game, autopilot=AUTOPILOTS[pilot]())
+    draw = partial(the_snake.draw_frame, surface, game,
+                   the_snake.Rock(game), snake, the_snake.Apple(game))
+    dirty_rects = the_snake.dirty_rects
+    exporter = open_exporter(path, surface.get_size(), speed, workers)
+    try:
+        draw()
+        dirty_rects.clear()
+        exporter.add(surface)
+        for _ in range(ticks):
+            snake.move()
+            draw()
+            rect = (changed_rect(surface, dirty_rects)
+                    if exporter.only_changes else None)
+            dirty_rects.clear()
+            exporter.add(surface, rect)
+    finally:
+        exporter.close()
+    return exporter.frames
+
+
+def main(argv=None):
+    """Функция запуска выгрузки из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path', help='файл .gif или каталог для PNG-кадров')
+    parser.add_argument('--ticks', type=int, default=300)
+    parser.add_argument('--pilot', choices=sorted(AUTOPILOTS), default='path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--level', type=int, default=None)
+    parser.add_argument('--speed', type=int, default=the_snake.SPEED)
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS)
+    args = parser.parse_args(argv)
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.init()
+    try:
+        return export_game(args.path, args.ticks, args.pilot, args.seed,
+                           args.level, args.speed, args.workers)
+    finally:
+        pygame.quit()
+
+
+if __name__ == '__main__':
+    main()
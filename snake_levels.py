@@ -0,0 +1,86 @@
+"""Уровни: постоянные камни, построенные по зерну.
+
+Уровень - маска с байтом на клетку, которую GameState загружает при старте
+и после каждого сброса. Генерация детерминирована зерном, а готовые маски
+хранятся в кэше, поэтому повторная загрузка уровня - это одно копирование.
+"""
+from collections import deque
+from functools import lru_cache
+from random import Random
+
+from snake_engine import GameState, neighbour_table
+
+# Доля клеток поля, занятая стенами уровня:
+LEVEL_DENSITY = 0.06
+
+# Радиус свободной области вокруг клетки появления змейки:
+START_CLEARANCE = 3
+
+# Сколько отрезков стен пробовать на клетку цели, прежде чем сдаться:
+# на плотных уровнях последние свободные клетки находятся всё реже
+WALL_ATTEMPTS = 4
+
+# Сколько сгенерированных уровней хранится в кэше:
+LEVEL_CACHE_SIZE = 64
+
+_INVERT = bytes.maketrans(b'\x00\x01', b'\x01\x00')
+
+
+@lru_cache(maxsize=LEVEL_CACHE_SIZE)
+def generate_level(width, height, seed, density=LEVEL_DENSITY):
+    """Функция строящая маску камней уровня по зерну.
+
+    Стены - отрезки случайной длины и направления. Вокруг клетки появления
+    змейки остаётся свободный квадрат, а пустоты, отрезанные стенами от
+    него, заливаются камнями, чтобы любое яблоко было достижимо. Стен
+    не больше, чем клеток вне этого квадрата, а на малом или плотном поле
+    уровень может выйти реже density.
+    """
+    rng = Random(seed)
+    mask = bytearray(width * height)
+    start_x, start_y = width // 2 - 1, height // 2 - 1
+    longest = max(3, min(width, height) // 3)
+    clear = ((min(width, start_x + START_CLEARANCE + 1)
+              - max(0, start_x - START_CLEARANCE))
+             * (min(height, start_y + START_CLEARANCE + 1)
+                - max(0, start_y - START_CLEARANCE)))
+    target = min(int(width * height * density), width * height - clear)
+    placed = 0
+    for _ in range(target * WALL_ATTEMPTS):
+        if placed >= target:
+            break
+        x, y = rng.randrange(width), rng.randrange(height)
+        dx, dy = rng.choice(((1, 0), (0, 1)))
+        for _ in range(rng.randint(2, longest)):
+            x, y = (x + dx) % width, (y + dy) % height
+            if (abs(x - start_x) <= START_CLEARANCE
+                    and abs(y - start_y) <= START_CLEARANCE):
+                break
+            if not mask[y * width + x]:
+                mask[y * width + x] = 1
+                placed += 1
+    _fill_pockets(mask, width, height, start_y * width + start_x)
+    return bytes(mask)
+
+
+def _fill_pockets(mask, width, height, start):
+    reached = bytearray(width * height)
+    reached[start] = 1
+    queue = deque([start])
+    neighbours = neighbour_table(width, height)
+    while queue:
+        cell = queue.popleft()
+        for table in neighbours:
+            neighbour = table[cell]
+            if not reached[neighbour] and not mask[neighbour]:
+                reached[neighbour] = 1
+                queue.append(neighbour)
+    # Всё, до чего не дошёл обход, - камень или отрезанная пустота
+    mask[:] = reached.translate(_INVERT)
+
+
+def level_game(seed, width, height, density=LEVEL_DENSITY, **kwargs):
+    """Функция создающая партию на уровне с зерном seed."""
+    return GameState(width, height,
+                     level=generate_level(width, height, seed, density),
+                     **kwargs)
@@ -0,0 +1,138 @@
+"""Замеры времени кадров и профилирование по запросу.
+
+FrameTimer пишет длительность каждой фазы кадра в кольцевые буферы
+фиксированного размера, так что память не растёт, а p50/p99 считаются по
+последним FRAME_HISTORY кадрам. NullTimer с тем же интерфейсом ничего не
+делает и подставляется, когда замеры выключены.
+"""
+import cProfile
+import json
+import signal
+from array import array
+from time import perf_counter
+
+# Фазы кадра в порядке их выполнения в main():
+PHASES = ('input', 'logic', 'draw', 'display', 'idle')
+INPUT, LOGIC, DRAW, DISPLAY, IDLE = range(len(PHASES))
+
+# Сколько последних кадров хранится для перцентилей:
+FRAME_HISTORY = 1024
+
+# Файл, в который сохраняется профиль cProfile:
+PROFILE_PATH = 'snake.prof'
+
+# Файл, в который сохраняется сводка замеров кадров при выходе из игры:
+SUMMARY_PATH = 'snake_frames.json'
+
+
+class FrameTimer:
+    """Замер фаз кадра с хранением в кольцевых буферах."""
+
+    def __init__(self, size=FRAME_HISTORY):
+        """Выделение буферов под size кадров для каждой фазы."""
+        self.size = size
+        self.samples = [array('d', bytes(8 * size)) for _ in PHASES]
+        self.frames = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self._row = [0.0] * len(PHASES)
+        self._frame_start = self._mark = perf_counter()
+
+    def start(self):
+        """Метод отмечающий начало кадра."""
+        self._frame_start = self._mark = perf_counter()
+
+    def mark(self, phase):
+        """Метод закрывающий фазу phase, начавшуюся с прошлой отметки."""
+        now = perf_counter()
+        self._row[phase] = now - self._mark
+        self._mark = now
+
+    def end(self):
+        """Метод сохраняющий замеры кадра в буферы."""
+        index = self.index
+        for samples, value in zip(self.samples, self._row):
+            samples[index] = value
+        self.frames[index] = self._mark - self._frame_start
+        self._row = [0.0] * len(PHASES)
+        self.index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def percentile(self, phase, q):
+        """Метод возвращающий q-й перцентиль фазы в миллисекундах.
+
+        phase=None означает длительность кадра целиком.
+        """
+        if not self.count:
+            return 0.0
+        samples = self.frames if phase is None else self.samples[phase]
+        ordered = sorted(samples[:self.count])
+        position = min(int(q / 100 * self.count), self.count - 1)
+        return ordered[position] * 1000
+
+    @property
+    def fps(self):
+        """Частота кадров по медианной длительности кадра."""
+        median = self.percentile(None, 50)
+        return 1000 / median if median else 0.0
+
+    def summary(self):
+        """Метод возвращающий p50/p99 всех фаз в миллисекундах."""
+        return {
+            name: {'p50': self.percentile(phase, 50),
+                   'p99': self.percentile(phase, 99)}
+            for phase, name in enumerate(PHASES)
+        }
+
+    def save(self, path=SUMMARY_PATH):
+        """Метод сохраняющий сводку summary в файл JSON."""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.summary(), file, indent=2)
+
+
+class NullTimer:
+    """Выключенный таймер: те же методы, но без работы."""
+
+    count = 0
+
+    def start(self):
+        """Пустой метод."""
+
+    def mark(self, phase):
+        """Пустой метод."""
+
+    def end(self):
+        """Пустой метод."""
+
+
+class ProfileSwitch:
+    """Включение и выключение cProfile по запросу с сохранением в файл."""
+
+    def __init__(self, path=PROFILE_PATH):
+        """Запоминание пути для сохранения профиля."""
+        self.path = path
+        self.profile = None
+
+    @property
+    def active(self):
+        """Идёт ли сейчас профилирование."""
+        return self.profile is not None
+
+    def toggle(self):
+        """Метод запускающий профиль или останавливающий и сохраняющий его."""
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+            self.profile = None
+
+    def install_signal(self):
+        """Метод включающий переключение профиля сигналом SIGUSR1."""
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggle())
+
+
+# Общий переключатель профиля для игры:
+profile_switch = ProfileSwitch()
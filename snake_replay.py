@@ -0,0 +1,186 @@
+"""Запись и воспроизведение партий.
+
+Партия полностью задаётся зерном генератора случайных чисел и тиками, на
+которых игрок поменял направление. В файл пишутся только они (varint), а
+также контрольные хэши состояния, по которым видно расхождение при
+воспроизведении.
+"""
+import struct
+import zlib
+from random import Random
+
+from snake_engine import GRID_HEIGHT, GRID_WIDTH, STEPS, GameState
+from snake_varint import read_varint, write_varint
+
+MAGIC = b'SNKR'
+VERSION = 1
+
+# Через сколько тиков сохраняется контрольный хэш:
+HASH_INTERVAL = 64
+
+_HASH_STATE = struct.Struct('<7i')
+_HASH = struct.Struct('<I')
+
+
+class ReplayError(Exception):
+    """Файл записи повреждён или имеет неизвестный формат."""
+
+
+class ReplayDivergence(Exception):
+    """Воспроизведение разошлось с записью."""
+
+    def __init__(self, tick):
+        """Сохранение тика, на котором обнаружено расхождение."""
+        super().__init__(f'Воспроизведение разошлось с записью к тику {tick}')
+        self.tick = tick
+
+
+def state_hash(game, previous=0):
+    """Функция продолжающая цепочку хэшей состоянием после тика.
+
+    Хэшируются голова, яблоко, длина, направление и число камней: это O(1)
+    на тик, а цепочка переносит любое расхождение во все следующие хэши.
+    """
+    x, y = game.xy(game.head)
+    apple_x, apple_y = (game.xy(game.apple) if game.apple is not None
+                        else (-1, -1))
+    return zlib.crc32(_HASH_STATE.pack(
+        x, y, apple_x, apple_y, game.length, game.heading, len(game.rocks)
+    ), previous)
+
+
+class RecordedGame(GameState):
+    """Партия, которая записывает повороты и контрольные хэши."""
+
+    __slots__ = ('seed', 'turns', 'hash', 'checkpoints')
+
+    def __init__(self, seed, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 track_changes=False):
+        """Создание партии с генератором, заданным зерном."""
+        self.seed = seed
+        # Повороты в виде пар (тик, индекс направления в STEPS)
+        self.turns = []
+        self.hash = 0
+        self.checkpoints = []
+        super().__init__(width, height, rng=Random(seed),
+                         track_changes=track_changes)
+
+    def step(self, action=None):
+        """Метод выполняющий тик и записывающий поворот, если он был."""
+        if (action is not None and action != self.direction
+                and self.turn(action)):
+            self.turns.append((self.ticks, STEPS.index(action)))
+        event = super().step()
+        self.hash = state_hash(self, self.hash)
+        if self.ticks % HASH_INTERVAL == 0:
+            self.checkpoints.append(self.hash)
+        return event
+
+    def to_replay(self):
+        """Метод возвращающий запись сыгранной части партии."""
+        return Replay(self.seed, self.width, self.height, self.ticks,
+                      list(self.turns), list(self.checkpoints), self.hash)
+
+
+class Replay:
+    """Запись партии: зерно, размеры поля, повороты и хэши."""
+
+    def __init__(self, seed, width, height, ticks, turns, checkpoints,
+                 final_hash):
+        """Сохранение всех частей записи."""
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.ticks = ticks
+        self.turns = turns
+        self.checkpoints = checkpoints
+        self.final_hash = final_hash
+
+    def to_bytes(self):
+        """Метод упаковывающий запись в компактный двоичный вид."""
+        out = bytearray(MAGIC)
+        out.append(VERSION)
+        for value in (self.seed, self.width, self.height, self.ticks,
+                      HASH_INTERVAL, len(self.turns)):
+            write_varint(out, value)
+        previous = 0
+        for tick, direction in self.turns:
+            # Разница тиков и направление в одном числе: 2 бита на поворот
+            write_varint(out, (tick - previous) << 2 | direction)
+            previous = tick
+        for value in self.checkpoints + [self.final_hash]:
+            out += _HASH.pack(value)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Метод распаковывающий запись из байтов."""
+        if data[:len(MAGIC)] != MAGIC:
+            raise ReplayError('Это не файл записи змейки')
+        if len(data) <= len(MAGIC):
+            raise ReplayError('Запись обрывается в заголовке')
+        version = data[len(MAGIC)]
+        if version != VERSION:
+            raise ReplayError(f'Неизвестная версия записи: {version}')
+        offset = len(MAGIC) + 1
+        values = []
+        for _ in range(6):
+            value, offset = read_varint(data, offset, ReplayError)
+            values.append(value)
+        seed, width, height, ticks, interval, count = values
+        if interval != HASH_INTERVAL:
+            raise ReplayError(f'Неподдерживаемый шаг хэшей: {interval}')
+        turns = []
+        tick = 0
+        for _ in range(count):
+            value, offset = read_varint(data, offset, ReplayError)
+            tick += value >> 2
+            turns.append((tick, value & 3))
+        # Хэши - по одному на каждые HASH_INTERVAL тиков и итоговый
+        if len(data) - offset != (ticks // HASH_INTERVAL + 1) * _HASH.size:
+            raise ReplayError('Число контрольных хэшей не совпадает')
+        hashes = [
+            _HASH.unpack_from(data, position)[0]
+            for position in range(offset, len(data), _HASH.size)
+        ]
+        return cls(seed, width, height, ticks, turns, hashes[:-1], hashes[-1])
+
+    def save(self, path):
+        """Метод сохраняющий запись в файл."""
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Метод читающий запись из файла."""
+        with open(path, 'rb') as file:
+            return cls.from_bytes(file.read())
+
+    def play(self, on_tick=None, track_changes=False):
+        """Метод воспроизводящий партию без задержек и сверяющий хэши.
+
+        on_tick(game, event) вызывается после каждого тика, например для
+        отрисовки. Возвращает итоговое состояние партии.
+        """
+        game = GameState(self.width, self.height, rng=Random(self.seed),
+                         track_changes=track_changes)
+        turns = iter(self.turns)
+        next_turn = next(turns, None)
+        checkpoints = iter(self.checkpoints)
+        digest = 0
+        step = game.step
+        for tick in range(self.ticks):
+            action = None
+            if next_turn is not None and next_turn[0] == tick:
+                action = STEPS[next_turn[1]]
+                next_turn = next(turns, None)
+            event = step(action)
+            digest = state_hash(game, digest)
+            if game.ticks % HASH_INTERVAL == 0:
+                if digest != next(checkpoints):
+                    raise ReplayDivergence(game.ticks)
+            if on_tick is not None:
+                on_tick(game, event)
+        if digest != self.final_hash:
+            raise ReplayDivergence(game.ticks)
+        return game
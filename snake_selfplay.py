@@ -0,0 +1,177 @@
+"""Массовые партии автопилотов без окна для сравнения стратегий.
+
+Партия идёт по обычным правилам GameState до первого столкновения или до
+max_ticks тиков и полностью задаётся своим зерном. Зёрна режутся на пачки,
+пачки раздаются процессам multiprocessing.Pool, а результаты возвращаются
+пачками и сводятся в один JSON-файл.
+
+Запуск: `python snake_selfplay.py --games 100000 --pilot cycle`.
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from multiprocessing import get_context
+from random import Random
+
+from snake_autopilot import AUTOPILOTS
+from snake_engine import (
+    GRID_HEIGHT, GRID_WIDTH, HIT_ROCK, HIT_SELF, ROCK_EVERY, SPEED, GameState
+)
+
+# Партия, дошедшая до предела тиков без столкновения:
+TIMEOUT = 'timeout'
+
+# Предел тиков одной партии:
+MAX_TICKS = 20_000
+
+# Партий в одной пачке, которую процесс возвращает за раз:
+BATCH_GAMES = 64
+
+# Файл сводки по умолчанию:
+SUMMARY_PATH = 'selfplay_summary.json'
+
+
+def play_game(seed, pilot='path', width=GRID_WIDTH, height=GRID_HEIGHT,
+              rock_every=ROCK_EVERY, max_ticks=MAX_TICKS):
+    """Функция играющая одну партию и возвращающая её итог.
+
+    Итог - кортеж (зерно, очки, длина, тики, причина окончания).
+    """
+    game = GameState(width, height, rng=Random(seed), rock_every=rock_every)
+    autopilot = AUTOPILOTS[pilot]()
+    choose = autopilot.choose
+    step = game.step
+    length = 1
+    cause = TIMEOUT
+    for _ in range(max_ticks):
+        # Перед сбросом запоминаем длину: после него она снова 1
+        length = game.length
+        event = step(choose(game))
+        if event == HIT_SELF or event == HIT_ROCK:
+            cause = event
+            break
+    else:
+        length = game.length
+    return seed, length - 1, length, game.ticks, cause
+
+
+def play_batch(seeds, options):
+    """Функция играющая пачку партий в процессе пула."""
+    return [play_game(seed, **options) for seed in seeds]
+
+
+def _play_batch(task):
+    return play_batch(*task)
+
+
+class SelfPlayStats:
+    """Накопление итогов партий и расчёт сводки."""
+
+    def __init__(self):
+        """Пустые списки итогов."""
+        self.scores = []
+        self.lengths = []
+        self.ticks = []
+        self.causes = Counter()
+
+    def add(self, results):
+        """Метод добавляющий итоги пачки партий."""
+        for _, score, length, ticks, cause in results:
+            self.scores.append(score)
+            self.lengths.append(length)
+            self.ticks.append(ticks)
+            self.causes[cause] += 1
+
+    def summary(self, speed=SPEED):
+        """Метод возвращающий сводку: средние, перцентили и причины."""
+        return {
+            'games': len(self.scores),
+            'score': _describe(self.scores),
+            'length': _describe(self.lengths),
+            'ticks': _describe(self.ticks),
+            'seconds': _describe([ticks / speed for ticks in self.ticks]),
+            'causes': dict(sorted(self.causes.items())),
+        }
+
+
+def _describe(values):
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def percentile(q):
+        return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+    return {
+        'mean': sum(ordered) / len(ordered),
+        'min': ordered[0],
+        'p50': percentile(50),
+        'p90': percentile(90),
+        'p99': percentile(99),
+        'max': ordered[-1],
+    }
+
+
+def run(games, seed=0, workers=None, batch=BATCH_GAMES, speed=SPEED,
+        **options):
+    """Функция играющая games партий на пуле процессов и возвращающая сводку.
+
+    Партия номер i получает зерно seed + i, поэтому сводка не зависит от
+    числа процессов. options передаются в play_game.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [
+        (range(start, min(start + batch, seed + games)), options)
+        for start in range(seed, seed + games, batch)
+    ]
+    stats = SelfPlayStats()
+    started = time.perf_counter()
+    if workers == 1:
+        for task in tasks:
+            stats.add(_play_batch(task))
+    else:
+        # spawn, а не fork: дочерний процесс не наследует потоки и pygame
+        with get_context('spawn').Pool(workers) as pool:
+            # Пачки приходят по мере готовности, порядок не важен
+            for results in pool.imap_unordered(_play_batch, tasks):
+                stats.add(results)
+    elapsed = time.perf_counter() - started
+    summary = stats.summary(speed)
+    summary.update(
+        seed=seed, workers=workers, seconds_elapsed=elapsed,
+        games_per_second=games / elapsed if elapsed else 0.0,
+        options=options,
+    )
+    return summary
+
+
+def main(argv=None):
+    """Функция запуска из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--pilot', choices=sorted(AUTOPILOTS), default='path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch', type=int, default=BATCH_GAMES)
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--rock-every', type=int, default=ROCK_EVERY)
+    parser.add_argument('--width', type=int, default=GRID_WIDTH)
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT)
+    parser.add_argument('--speed', type=int, default=SPEED)
+    parser.add_argument('--output', default=SUMMARY_PATH)
+    args = parser.parse_args(argv)
+    summary = run(
+        args.games, seed=args.seed, workers=args.workers, batch=args.batch,
+        speed=args.speed, pilot=args.pilot, width=args.width,
+        height=args.height, rock_every=args.rock_every,
+        max_ticks=args.max_ticks,
+    )
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,519 @@
+"""Сетевая игра: общее поле на сервере asyncio и клиенты с зеркалом поля.
+
+Сервер - единственный источник правды: он ведёт арену SharedBoard с постоянным
+шагом тиков и после каждого тика рассылает всем одно и то же сообщение с
+изменениями (новые головы, снятые хвосты, появления змеек, яблоки, камни).
+Подключившийся клиент один раз получает снимок поля, дальше - только
+изменения, поэтому трафик и работа сервера за тик зависят от числа
+изменений, а не от размера поля.
+
+Сообщение - длина (varint) и тело: байт типа и числа varint. Клиент
+повторяет изменения на RemoteBoard и сразу показывает свой поворот, не
+дожидаясь ответа сервера.
+
+Запуск сервера: `python snake_server.py --port 50555`.
+"""
+import argparse
+import asyncio
+from collections import deque
+
+from snake_arena import APPLES, Arena
+from snake_engine import (
+    GRID_HEIGHT, GRID_WIDTH, ROCK_EVERY, SPEED, STEPS, ObstacleLayer,
+    neighbour_table
+)
+from snake_levels import generate_level
+from snake_varint import read_varint, write_varint
+
+VERSION = 1
+
+# Адрес и порт сервера по умолчанию:
+HOST = '127.0.0.1'
+PORT = 50555
+
+# Больше стольких неотправленных байт у клиента - он не успевает и отключается:
+MAX_BUFFER = 1 << 16
+
+# На сколько тиков сервер может отстать, прежде чем отбросить отставание:
+MAX_LAG_TICKS = 5
+
+# Сколько байт читать из сокета за раз:
+READ_SIZE = 1 << 16
+
+# Типы сообщений:
+HELLO = 1
+SNAPSHOT = 2
+DELTA = 3
+TURN = 16
+
+# Изменения внутри DELTA:
+OP_MOVE = 1    # игрок, голова: новая голова и снятый хвост
+OP_GROW = 2    # игрок, голова: новая голова, яблоко в ней съедено
+OP_SPAWN = 3   # игрок, направление, клетка: змейка заново из одной клетки
+OP_LEAVE = 4   # игрок: змейка ушла с поля
+OP_APPLE = 5   # клетка: новое яблоко
+OP_ROCK = 6    # клетка: новый камень
+
+
+class ProtocolError(Exception):
+    """Сообщение повреждено или имеет неизвестный формат."""
+
+
+def frame(payload):
+    """Функция добавляющая к телу сообщения его длину."""
+    out = bytearray()
+    write_varint(out, len(payload))
+    return bytes(out + payload)
+
+
+class MessageReader:
+    """Разбор потока байт на тела сообщений: без сокетов и asyncio."""
+
+    def __init__(self):
+        """Пустой буфер недочитанных байт."""
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Метод принимающий байты и возвращающий список целых сообщений."""
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+        while True:
+            try:
+                length, start = read_varint(buffer, offset, ProtocolError)
+            except ProtocolError:
+                # Длина ещё не пришла целиком
+                break
+            if start + length > len(buffer):
+                break
+            messages.append(bytes(buffer[start:start + length]))
+            offset = start + length
+        del buffer[:offset]
+        return messages
+
+
+class _Payload:
+    """Чтение чисел varint из тела сообщения по порядку."""
+
+    __slots__ = ('data', 'offset')
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def __bool__(self):
+        return self.offset < len(self.data)
+
+    def varint(self):
+        value, self.offset = read_varint(self.data, self.offset,
+                                         ProtocolError)
+        return value
+
+    def take(self, size):
+        end = self.offset + size
+        if end > len(self.data):
+            raise ProtocolError('Сообщение короче, чем объявлено')
+        chunk = self.data[self.offset:end]
+        self.offset = end
+        return chunk
+
+
+class SharedBoard(Arena):
+    """Арена сервера: изменения каждого тика сразу кодируются в буфер ops.
+
+    Правила - как в Arena с возрождением: столкнувшаяся змейка появляется
+    заново длиной 1, а камни и яблоки остаются, так как поле общее.
+    """
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, rng=None,
+                 apples=APPLES, rock_every=ROCK_EVERY, level=None):
+        """Создание поля с камнями уровня level и apples яблоками."""
+        self.ops = bytearray()
+        super().__init__(width, height, rng, apples, rock_every, level)
+
+    def hello(self, snake_id, rate=SPEED):
+        """Метод кодирующий приветствие: номер игрока, поле и частоту тиков."""
+        out = bytearray((HELLO,))
+        for value in (VERSION, snake_id, self.width, self.height, rate):
+            write_varint(out, value)
+        return frame(out)
+
+    def snapshot(self):
+        """Метод кодирующий всё поле для нового клиента."""
+        out = bytearray((SNAPSHOT,))
+        write_varint(out, self.ticks)
+        out += self.rocks.to_bits()
+        write_varint(out, len(self.apples))
+        for cell in self.apples:
+            write_varint(out, cell)
+        snakes = [(snake_id, snake) for snake_id, snake in self.snakes.items()
+                  if snake.body]
+        write_varint(out, len(snakes))
+        for snake_id, snake in snakes:
+            for value in (snake_id, snake.heading, len(snake.body)):
+                write_varint(out, value)
+            for cell in snake.body:
+                write_varint(out, cell)
+        return frame(out)
+
+    def pop_delta(self):
+        """Метод возвращающий сообщение с изменениями и очищающий буфер."""
+        out = bytearray((DELTA,))
+        write_varint(out, self.ticks)
+        out += self.ops
+        self.ops.clear()
+        return frame(out)
+
+    def _on_move(self, snake_id, head, grew):
+        self._op(OP_GROW if grew else OP_MOVE, snake_id, head)
+
+    def _on_spawn(self, snake_id):
+        snake = self.snakes[snake_id]
+        self._op(OP_SPAWN, snake_id, snake.heading, snake.body[0])
+
+    def _on_remove(self, snake_id):
+        self._op(OP_LEAVE, snake_id)
+
+    def _on_apple(self, cell):
+        self._op(OP_APPLE, cell)
+
+    def _on_rock(self, cell):
+        self._op(OP_ROCK, cell)
+
+    def _op(self, code, *values):
+        self.ops.append(code)
+        for value in values:
+            write_varint(self.ops, value)
+
+
+class RemoteBoard:
+    """Зеркало общего поля у клиента, собираемое из сообщений сервера.
+
+    Хранит тела всех змеек, яблоки и камни, а в changes копит клетки,
+    которые надо перерисовать. Свой поворот применяется к heading сразу,
+    и predicted_head показывает, куда змейка игрока шагнёт на следующем тике.
+    """
+
+    def __init__(self):
+        """Пустое зеркало до приветствия сервера."""
+        self.player = None
+        self.width = self.height = 0
+        self.rate = SPEED
+        self.ticks = 0
+        self.bodies = {}
+        self.apples = set()
+        self.rocks = ObstacleLayer(0)
+        self.occupied = bytearray()
+        # Счётчик сегментов змейки игрока: чтобы отличать её при отрисовке
+        self.own = bytearray()
+        self.neighbours = None
+        # Направление последнего хода по данным сервера и выбранное игроком
+        self.moved = self.heading = None
+        self.changes = set()
+        self._messages = MessageReader()
+
+    @property
+    def ready(self):
+        """Получен ли снимок поля."""
+        return self.neighbours is not None and self.player in self.bodies
+
+    def feed(self, data):
+        """Метод применяющий принятые байты и возвращающий число сообщений."""
+        messages = self._messages.feed(data)
+        for payload in messages:
+            self.apply(payload)
+        return len(messages)
+
+    def apply(self, payload):
+        """Метод применяющий одно сообщение сервера."""
+        if not payload:
+            raise ProtocolError('Пустое сообщение')
+        reader = _Payload(payload, 1)
+        kind = payload[0]
+        if kind == DELTA:
+            self.ticks = reader.varint()
+            while reader:
+                self._apply_op(reader)
+        elif kind == SNAPSHOT:
+            self._load(reader)
+        elif kind == HELLO:
+            self._greet(reader)
+        else:
+            raise ProtocolError(f'Неизвестный тип сообщения {kind}')
+
+    def turn(self, direction):
+        """Метод меняющий своё направление и возвращающий сообщение серверу.
+
+        Разворот назад не отправляется: сервер его всё равно отклонит.
+        """
+        heading = STEPS.index(direction)
+        if self.heading is None or heading in (self.heading,
+                                               self.heading ^ 1):
+            return b''
+        self.heading = heading
+        return frame(bytes((TURN, heading)))
+
+    def predicted_head(self):
+        """Метод возвращающий клетку, куда змейка игрока шагнёт следующей."""
+        body = self.bodies.get(self.player)
+        if not body or self.heading is None:
+            return None
+        return self.neighbours[self.heading][body[0]]
+
+    def _greet(self, reader):
+        version, self.player, width, height, self.rate = (
+            reader.varint() for _ in range(5)
+        )
+        if version != VERSION:
+            raise ProtocolError(f'Неподдерживаемая версия {version}')
+        self.width, self.height = width, height
+        self.neighbours = neighbour_table(width, height)
+        self.occupied = bytearray(width * height)
+        self.own = bytearray(width * height)
+
+    def _load(self, reader):
+        if self.neighbours is None:
+            raise ProtocolError('Снимок поля пришёл до приветствия')
+        cells = self.width * self.height
+        self.ticks = reader.varint()
+        self.rocks = ObstacleLayer.from_bits(
+            cells, reader.take((cells + 7) // 8)
+        )
+        self.apples = {reader.varint() for _ in range(reader.varint())}
+        self.occupied = bytearray(cells)
+        self.own = bytearray(cells)
+        self.bodies = {}
+        for _ in range(reader.varint()):
+            player_id, heading, length = (reader.varint() for _ in range(3))
+            self._spawn(player_id, heading, [
+                reader.varint() for _ in range(length)
+            ])
+        self.changes = set(range(cells))
+
+    def _apply_op(self, reader):
+        code = reader.varint()
+        if code in (OP_MOVE, OP_GROW):
+            player_id, head = reader.varint(), reader.varint()
+            self._push(player_id, head)
+            if code == OP_MOVE:
+                self._pop(player_id)
+            else:
+                self.apples.discard(head)
+        elif code == OP_SPAWN:
+            player_id, heading, cell = (reader.varint() for _ in range(3))
+            self._spawn(player_id, heading, [cell])
+        elif code == OP_LEAVE:
+            self._spawn(reader.varint(), None, [])
+        elif code == OP_APPLE:
+            cell = reader.varint()
+            self.apples.add(cell)
+            self.changes.add(cell)
+        elif code == OP_ROCK:
+            cell = reader.varint()
+            self.rocks.add(cell)
+            self.changes.add(cell)
+        else:
+            raise ProtocolError(f'Неизвестное изменение {code}')
+
+    def _spawn(self, player_id, heading, cells):
+        # Появление заменяет тело целиком, поэтому повтор безопасен
+        while self.bodies.get(player_id):
+            self._pop(player_id)
+        if not cells:
+            self.bodies.pop(player_id, None)
+            return
+        self.bodies[player_id] = deque()
+        for cell in reversed(cells):
+            self._push(player_id, cell)
+        if player_id == self.player:
+            self.heading = self.moved = heading
+
+    def _push(self, player_id, cell):
+        body = self.bodies.get(player_id)
+        if body is None:
+            raise ProtocolError(f'Ход неизвестного игрока {player_id}')
+        if player_id == self.player:
+            self.own[cell] += 1
+            if body:
+                self._track(body[0], cell)
+        body.appendleft(cell)
+        self.occupied[cell] += 1
+        self.changes.add(cell)
+
+    def _track(self, head, cell):
+        # Направление, в котором сервер на самом деле сдвинул голову
+        for heading, table in enumerate(self.neighbours):
+            if table[head] == cell:
+                self.moved = heading
+        # Предсказанный поворот держится, пока сервер его не отклонит
+        if self.heading is None or self.heading == self.moved ^ 1:
+            self.heading = self.moved
+
+    def _pop(self, player_id):
+        cell = self.bodies[player_id].pop()
+        self.occupied[cell] -= 1
+        if player_id == self.player:
+            self.own[cell] -= 1
+        self.changes.add(cell)
+
+
+class GameServer:
+    """Сервер asyncio: принимает игроков, ведёт тики и рассылает изменения."""
+
+    def __init__(self, board=None, rate=SPEED, max_buffer=MAX_BUFFER):
+        """Запоминание поля, частоты тиков и предела буфера клиента."""
+        self.board = board if board is not None else SharedBoard()
+        self.rate = rate
+        self.max_buffer = max_buffer
+        self.clients = {}
+        self.server = None
+
+    async def start(self, host=HOST, port=PORT):
+        """Метод открывающий порт и возвращающий фактический адрес.
+
+        port=0 - свободный порт, выбранный системой: удобно для тестов.
+        """
+        self.server = await asyncio.start_server(self._serve_client,
+                                                 host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    def tick(self):
+        """Метод выполняющий тик и рассылающий его изменения всем игрокам.
+
+        Сообщение кодируется один раз и одинаково для всех клиентов.
+        """
+        self.board.step()
+        delta = self.board.pop_delta()
+        self.broadcast(delta)
+        return delta
+
+    def broadcast(self, data):
+        """Метод отправляющий data всем; отстающие клиенты отключаются."""
+        for player_id, writer in list(self.clients.items()):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                self._drop(player_id)
+            else:
+                writer.write(data)
+
+    async def run(self, ticks=None):
+        """Метод ведущий тики с постоянным шагом: ticks раз или бесконечно."""
+        loop = asyncio.get_running_loop()
+        period = 1 / self.rate
+        deadline = loop.time()
+        done = 0
+        while ticks is None or done < ticks:
+            self.tick()
+            done += 1
+            deadline += period
+            delay = deadline - loop.time()
+            if delay < -period * MAX_LAG_TICKS:
+                # Сильно отстали: не догоняем пачкой тиков, а сдвигаем отсчёт
+                deadline = loop.time()
+            await asyncio.sleep(max(delay, 0))
+
+    async def close(self):
+        """Метод закрывающий порт и все соединения."""
+        for player_id in list(self.clients):
+            self._drop(player_id)
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _serve_client(self, reader, writer):
+        board = self.board
+        player_id = board.add_snake()
+        writer.write(board.hello(player_id, self.rate) + board.snapshot())
+        self.clients[player_id] = writer
+        messages = MessageReader()
+        try:
+            while data := await reader.read(READ_SIZE):
+                for payload in messages.feed(data):
+                    if len(payload) != 2 or payload[0] != TURN:
+                        raise ProtocolError('Ожидался поворот')
+                    board.turn(player_id, payload[1])
+        except (ConnectionError, ProtocolError):
+            pass
+        finally:
+            self._drop(player_id)
+
+    def _drop(self, player_id):
+        writer = self.clients.pop(player_id, None)
+        self.board.remove_snake(player_id)
+        if writer is not None:
+            writer.close()
+
+
+class RemoteClient:
+    """Клиент asyncio без окна: для ботов и тестов."""
+
+    def __init__(self, reader, writer):
+        """Запоминание потоков соединения и пустое зеркало поля."""
+        self.reader = reader
+        self.writer = writer
+        self.board = RemoteBoard()
+
+    @classmethod
+    async def connect(cls, host=HOST, port=PORT):
+        """Метод подключающийся к серверу и ждущий снимок поля."""
+        client = cls(*await asyncio.open_connection(host, port))
+        while not client.board.ready:
+            await client.receive()
+        return client
+
+    async def receive(self):
+        """Метод читающий и применяющий очередную порцию сообщений."""
+        data = await self.reader.read(READ_SIZE)
+        if not data:
+            raise ConnectionError('Сервер закрыл соединение')
+        return self.board.feed(data)
+
+    async def wait_tick(self, ticks):
+        """Метод читающий сообщения, пока зеркало не дойдёт до тика ticks."""
+        while self.board.ticks < ticks:
+            await self.receive()
+
+    def turn(self, direction):
+        """Метод отправляющий поворот серверу."""
+        self.writer.write(self.board.turn(direction))
+
+    async def close(self):
+        """Метод закрывающий соединение."""
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def serve(host=HOST, port=PORT, rate=SPEED, **options):
+    """Функция запускающая сервер до остановки процесса."""
+    server = GameServer(SharedBoard(**options), rate)
+    await server.start(host, port)
+    try:
+        await server.run()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    """Функция запуска сервера из командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--rate', type=int, default=SPEED)
+    parser.add_argument('--width', type=int, default=GRID_WIDTH)
+    parser.add_argument('--height', type=int, default=GRID_HEIGHT)
+    parser.add_argument('--apples', type=int, default=APPLES)
+    parser.add_argument('--level', type=int, default=None)
+    args = parser.parse_args(argv)
+    level = None
+    if args.level is not None:
+        level = generate_level(args.width, args.height, args.level)
+    try:
+        asyncio.run(serve(args.host, args.port, args.rate, width=args.width,
+                          height=args.height, apples=args.apples,
+                          level=level))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
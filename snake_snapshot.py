@@ -0,0 +1,316 @@
+"""Снимки партий: сохранение и восстановление состояния GameState.
+
+Снимок - заголовок фиксированного размера, состояние генератора
+случайных чисел, камни и уровень по биту на клетку и тело змейки: клетка
+головы и по 2 бита на каждый следующий сегмент (направление от
+предыдущего). В конце лежит порядок свободных клеток: от него зависит,
+куда лягут следующие яблоки и камни, и с ним восстановленная партия идёт
+тик в тик как исходная. Порядок хранится разностями соседних клеток,
+сжатыми zlib: пока поле почти пустое, разности почти все равны 1, и
+порядок поля 1000x1000 занимает несколько КБ вместо 4 МБ, а упаковка и
+распаковка такого поля стоят порядка 0.2 с. Снимки дописываются в архив
+друг за другом, и обрыв записи при падении портит только последний из них.
+
+Архив читается через mmap: заголовки всех снимков разбираются прямо из
+отображённой памяти без чтения тел, а восстановление партии берёт из неё
+только свой снимок.
+"""
+import mmap
+import operator
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from random import Random
+
+from snake_engine import GameState, ObstacleLayer, neighbour_table
+
+MAGIC = b'SNKS'
+VERSION = 2
+
+# Флаги заголовка:
+HAS_LEVEL = 1
+HAS_GAUSS = 2
+HAS_APPLE = 4
+HAS_LAST = 8
+
+# magic, версия, флаги, ширина, высота, направление, каждое какое яблоко
+# даёт камень, тики, длина, яблоко, последний снятый хвост, число свободных
+# клеток, размер снимка и CRC32 всего, что идёт после заголовка
+_HEADER = struct.Struct('<4sBBHHBxHQIIIIII')
+# Состояние Mersenne Twister: 624 слова и позиция, затем gauss_next
+_RNG_WORDS = 625
+_RNG = struct.Struct(f'<{_RNG_WORDS}Id')
+_RNG_VERSION = 3
+
+# Уровень сжатия zlib для порядка свободных клеток:
+FREE_LEVEL = 6
+
+# Сегменты тела по 4 на байт: направление каждого из байта
+_CODES = [tuple(byte >> shift & 3 for shift in (0, 2, 4, 6))
+          for byte in range(256)]
+
+
+class SnapshotError(Exception):
+    """Снимок повреждён или имеет неизвестный формат."""
+
+
+class SnapshotInfo:
+    """Заголовок снимка: то, что видно без распаковки тела и камней."""
+
+    __slots__ = ('offset', 'size', 'width', 'height', 'heading', 'ticks',
+                 'length', 'apple')
+
+    def __init__(self, offset, size, width, height, heading, ticks, length,
+                 apple):
+        """Положение снимка в архиве и поля его заголовка."""
+        self.offset = offset
+        self.size = size
+        self.width = width
+        self.height = height
+        self.heading = heading
+        self.ticks = ticks
+        self.length = length
+        self.apple = apple
+
+
+def _pack_body(game):
+    """Функция упаковывающая сегменты после головы по 2 бита."""
+    body = game.body
+    tables = game.neighbours
+    packed = bytearray((len(body) + 2) // 4)
+    previous = body[0]
+    for index in range(1, len(body)):
+        cell = body[index]
+        # Направление, ведущее от предыдущего сегмента к этому
+        for heading, table in enumerate(tables):
+            if table[previous] == cell:
+                break
+        else:
+            raise SnapshotError('Сегменты змейки не соседствуют')
+        packed[(index - 1) >> 2] |= heading << ((index - 1 & 3) << 1)
+        previous = cell
+    return packed
+
+
+def _unpack_body(tables, head, length, packed):
+    cells = [head]
+    append = cells.append
+    cell = head
+    remaining = length - 1
+    for byte in packed:
+        for heading in _CODES[byte][:remaining]:
+            cell = tables[heading][cell]
+            append(cell)
+        remaining -= 4
+        if remaining <= 0:
+            break
+    return cells
+
+
+def _pack_free(game):
+    free = game.free_cells
+    deltas = array('i', free[:1])
+    deltas += array('i', map(operator.sub, free[1:], free[:-1]))
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+    return zlib.compress(deltas, FREE_LEVEL)
+
+
+def _unpack_free(count, view):
+    deltas = array('i')
+    try:
+        deltas.frombytes(zlib.decompress(view))
+    except (zlib.error, ValueError) as error:
+        raise SnapshotError('Порядок свободных клеток повреждён') from error
+    if len(deltas) != count:
+        raise SnapshotError('Число свободных клеток не совпадает')
+    if sys.byteorder != 'little':
+        deltas.byteswap()
+    return array('i', accumulate(deltas))
+
+
+def dump_game(game):
+    """Функция упаковывающая партию в байты одного снимка."""
+    version, words, gauss = game.rng.getstate()
+    if version != _RNG_VERSION or len(words) != _RNG_WORDS:
+        raise SnapshotError('Неподдерживаемое состояние генератора')
+    flags = ((HAS_LEVEL if game.level is not None else 0)
+             | (HAS_GAUSS if gauss is not None else 0)
+             | (HAS_APPLE if game.apple is not None else 0)
+             | (HAS_LAST if game.last is not None else 0))
+    payload = bytearray(_RNG.pack(*words, gauss or 0.0))
+    payload += game.rocks.to_bits()
+    if game.level is not None:
+        payload += ObstacleLayer(len(game.level), game.level).to_bits()
+    payload += struct.pack('<I', game.head)
+    payload += _pack_body(game)
+    payload += _pack_free(game)
+    header = _HEADER.pack(
+        MAGIC, VERSION, flags, game.width, game.height, game.heading,
+        game.rock_every, game.ticks, game.length, game.apple or 0,
+        game.last or 0, len(game.free_cells), _HEADER.size + len(payload),
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def read_info(buffer, offset=0):
+    """Функция читающая заголовок снимка из buffer, не трогая остальное."""
+    if len(buffer) - offset < _HEADER.size:
+        raise SnapshotError('Снимок обрывается в заголовке')
+    (magic, version, flags, width, height, heading, _, ticks, length,
+     apple, _, _, size, _) = _HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC:
+        raise SnapshotError('Это не снимок змейки')
+    if version != VERSION:
+        raise SnapshotError(f'Неизвестная версия снимка: {version}')
+    if len(buffer) - offset < size:
+        raise SnapshotError('Снимок обрывается')
+    return SnapshotInfo(offset, size, width, height, heading, ticks, length,
+                        apple if flags & HAS_APPLE else None)
+
+
+def load_game(buffer, offset=0, track_changes=False):
+    """Функция восстанавливающая партию из снимка в buffer.
+
+    buffer - bytes, memoryview или mmap: части снимка читаются из него
+    срезами memoryview без промежуточных копий.
+    """
+    info = read_info(buffer, offset)
+    (_, _, flags, width, height, heading, rock_every, ticks, length,
+     apple, last, free, _, checksum) = _HEADER.unpack_from(buffer, offset)
+    cells = width * height
+    bits = (cells + 7) // 8
+    with memoryview(buffer) as view:
+        position = offset + _HEADER.size
+        if zlib.crc32(view[position:offset + info.size]) != checksum:
+            raise SnapshotError('Контрольная сумма снимка не совпадает')
+        *words, gauss = _RNG.unpack_from(view, position)
+        position += _RNG.size
+        rocks = ObstacleLayer.from_bits(cells, view[position:position + bits])
+        position += bits
+        level = None
+        if flags & HAS_LEVEL:
+            level = bytes(ObstacleLayer.from_bits(
+                cells, view[position:position + bits]
+            ).mask)
+            position += bits
+        (head,) = struct.unpack_from('<I', view, position)
+        position += 4
+        body_bytes = (length + 2) // 4
+        body = _unpack_body(neighbour_table(width, height), head, length,
+                            view[position:position + body_bytes])
+        position += body_bytes
+        free = _unpack_free(free, view[position:offset + info.size])
+    rng = Random()
+    game = GameState(width, height, rng=rng, track_changes=track_changes,
+                     rock_every=rock_every, level=level)
+    game.restore(ticks, rocks, body, heading,
+                 apple if flags & HAS_APPLE else None,
+                 last if flags & HAS_LAST else None, free)
+    # Конструктор уже потратил случайные числа на яблоко
+    rng.setstate((_RNG_VERSION, tuple(words),
+                  gauss if flags & HAS_GAUSS else None))
+    return game
+
+
+class SnapshotWriter:
+    """Дописывание снимков в архив: для пауз и контрольных точек."""
+
+    def __init__(self, path, sync=False):
+        """Открытие архива на дописывание; sync - сбрасывать на диск."""
+        self.file = open(path, 'ab')
+        self.sync = sync
+
+    def write(self, game):
+        """Метод дописывающий снимок партии и возвращающий его размер."""
+        data = dump_game(game)
+        self.file.write(data)
+        self.file.flush()
+        if self.sync:
+            os.fsync(self.file.fileno())
+        return len(data)
+
+    def close(self):
+        """Метод закрывающий архив."""
+        self.file.close()
+
+    def __enter__(self):
+        """Вход в контекст: сам писатель."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Выход из контекста закрывает архив."""
+        self.close()
+
+
+class SnapshotArchive:
+    """Архив снимков, отображённый в память через mmap.
+
+    При открытии проходятся только заголовки: каждый указывает размер
+    снимка, и следующий заголовок ищется прыжком. Недописанный хвост
+    архива (обрыв при падении) отбрасывается.
+    """
+
+    def __init__(self, path):
+        """Отображение файла в память и чтение заголовков снимков."""
+        self.file = open(path, 'rb')
+        self.map = None
+        self.infos = []
+        if os.fstat(self.file.fileno()).st_size:
+            self.map = mmap.mmap(self.file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            self._scan()
+
+    def _scan(self):
+        offset = 0
+        while offset < len(self.map):
+            try:
+                info = read_info(self.map, offset)
+            except SnapshotError:
+                break
+            self.infos.append(info)
+            offset += info.size
+
+    def __len__(self):
+        """Число целых снимков в архиве."""
+        return len(self.infos)
+
+    def __iter__(self):
+        """Метод перечисляющий заголовки снимков."""
+        return iter(self.infos)
+
+    def restore(self, index=-1, track_changes=False):
+        """Метод восстанавливающий партию из снимка номер index."""
+        if not self.infos:
+            raise SnapshotError('В архиве нет снимков')
+        return load_game(self.map, self.infos[index].offset, track_changes)
+
+    def close(self):
+        """Метод снимающий отображение и закрывающий файл."""
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        """Вход в контекст: сам архив."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Выход из контекста закрывает архив."""
+        self.close()
+
+
+def save_game(path, game):
+    """Функция дописывающая снимок партии в архив path."""
+    with SnapshotWriter(path) as writer:
+        writer.write(game)
+
+
+def resume_game(path, track_changes=False):
+    """Функция восстанавливающая последнюю партию из архива path."""
+    with SnapshotArchive(path) as archive:
+        return archive.restore(-1, track_changes)
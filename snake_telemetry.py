@@ -0,0 +1,133 @@
+"""Канал игровых событий без записи в stdout на игровом потоке.
+
+События складываются в заранее выделенный буфер целых чисел. Заполненный
+буфер целиком передаётся фоновому потоку, который превращает его в строки
+JSON и пишет в поток вывода, а игре отдаёт запасной буфер. NullChannel
+выключает телеметрию полностью.
+"""
+import json
+import queue
+import threading
+from array import array
+
+# Коды событий и их имена в журнале:
+EVENTS = ('move', 'meal', 'rock', 'reset_self', 'reset_rock')
+MOVE, MEAL, ROCK, RESET_SELF, RESET_ROCK = range(len(EVENTS))
+
+# Поля одного события: тик, код, x, y, значение
+FIELDS = ('tick', 'event', 'x', 'y', 'value')
+
+# Сколько событий помещается в один буфер:
+BUFFER_EVENTS = 256
+
+# Сколько буферов может одновременно ждать записи:
+BUFFERS = 2
+
+
+class TelemetryChannel:
+    """Буферизованный канал событий с записью в фоновом потоке."""
+
+    enabled = True
+
+    def __init__(self, stream, capacity=BUFFER_EVENTS, buffers=BUFFERS,
+                 owns_stream=False):
+        """Выделение буферов и запуск потока записи в stream."""
+        self.stream = stream
+        self.owns_stream = owns_stream
+        self.capacity = capacity
+        self.size = 0
+        # Событий, потерянных из-за того, что запись не успевала
+        self.dropped = 0
+        self._buffer = self._allocate()
+        self._spare = queue.Queue()
+        for _ in range(buffers - 1):
+            self._spare.put(self._allocate())
+        self._full = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop,
+                                        name='telemetry', daemon=True)
+        self._writer.start()
+
+    @classmethod
+    def to_file(cls, path, **kwargs):
+        """Метод создающий канал, который пишет в файл и сам его закрывает."""
+        return cls(open(path, 'w', encoding='utf-8'), owns_stream=True,
+                   **kwargs)
+
+    def emit(self, tick, event, x=-1, y=-1, value=0):
+        """Метод записывающий событие в текущий буфер за O(1)."""
+        size = self.size
+        if size == self.capacity:
+            self.flush()
+            size = self.size
+            if size == self.capacity:
+                self.dropped += 1
+                return
+        base = size * len(FIELDS)
+        buffer = self._buffer
+        buffer[base] = tick
+        buffer[base + 1] = event
+        buffer[base + 2] = x
+        buffer[base + 3] = y
+        buffer[base + 4] = value
+        self.size = size + 1
+
+    def flush(self):
+        """Метод передающий накопленные события потоку записи."""
+        if not self.size:
+            return
+        try:
+            spare = self._spare.get_nowait()
+        except queue.Empty:
+            return
+        self._full.put((self._buffer, self.size))
+        self._buffer = spare
+        self.size = 0
+
+    def close(self):
+        """Метод дописывающий все события и останавливающий поток."""
+        if self.size:
+            self._full.put((self._buffer, self.size))
+            self.size = 0
+        self._full.put(None)
+        self._writer.join()
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+    def _allocate(self):
+        return array('q', bytes(8 * self.capacity * len(FIELDS)))
+
+    def _write_loop(self):
+        width = len(FIELDS)
+        while True:
+            item = self._full.get()
+            if item is None:
+                return
+            buffer, size = item
+            lines = []
+            for base in range(0, size * width, width):
+                record = dict(zip(FIELDS, buffer[base:base + width]))
+                record['event'] = EVENTS[record['event']]
+                lines.append(json.dumps(record) + '\n')
+            self.stream.write(''.join(lines))
+            self._spare.put(buffer)
+
+
+class NullChannel:
+    """Выключенная телеметрия."""
+
+    enabled = False
+    dropped = 0
+
+    def emit(self, tick, event, x=-1, y=-1, value=0):
+        """Пустой метод."""
+
+    def flush(self):
+        """Пустой метод."""
+
+    def close(self):
+        """Пустой метод."""
+
+
+NULL_CHANNEL = NullChannel()
@@ -0,0 +1,32 @@
+"""Числа varint: общий код для файлов записей и сетевых сообщений.
+
+Неотрицательное число пишется по 7 бит на байт, младшие первыми; старший
+бит байта означает, что число продолжается. Малые числа - тики, клетки
+и длины - занимают один-два байта.
+"""
+
+
+def write_varint(out, value):
+    """Функция дописывающая в out неотрицательное число в формате varint."""
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset, error=ValueError):
+    """Функция читающая число varint с позиции offset.
+
+    Возвращает пару (число, позиция после него); если данные кончаются
+    посреди числа, бросает исключение error.
+    """
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise error('Данные обрываются посреди числа')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
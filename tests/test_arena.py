@@ -0,0 +1,229 @@
+import time
+from random import Random
+
+import pygame
+import pytest
+
+from conftest import StopInfiniteLoop
+from snake_arena import (
+    FREE, HIT_HEAD, HIT_SNAKE, Arena, CellPool, GreedyPilot
+)
+from snake_engine import (
+    DOWN, HIT_ROCK, HIT_SELF, LEFT, RIGHT, SPEED, STEPS, UP, Board, GameState
+)
+
+
+def _arena(snakes, **options):
+    arena = Arena(10, 6, rng=Random(0), apples=0, **options)
+    for _ in range(snakes):
+        arena.add_snake()
+    return arena
+
+
+def test_head_to_head_kills_both():
+    arena = _arena(2)
+    arena.place_snake(0, [arena.cell(2, 1)], STEPS.index(RIGHT))
+    arena.place_snake(1, [arena.cell(4, 1)], STEPS.index(LEFT))
+    deaths = arena.step()
+    assert sorted(deaths) == [(0, HIT_HEAD), (1, HIT_HEAD)], (
+        'Две головы в одной клетке должны погибнуть обе.'
+    )
+    assert arena.owner[arena.cell(3, 1)] == FREE
+
+
+def test_head_to_body_credits_owner():
+    arena = _arena(2)
+    arena.place_snake(0, [arena.cell(x, 2) for x in (5, 4, 3)],
+                      STEPS.index(RIGHT))
+    arena.place_snake(1, [arena.cell(4, 1)], STEPS.index(DOWN))
+    assert arena.step() == [(1, HIT_SNAKE)]
+    assert arena.snakes[0].kills == 1
+    assert len(arena.snakes[0].body) == 3
+
+
+def test_head_may_follow_tail_of_other_snake():
+    arena = _arena(2)
+    arena.place_snake(0, [arena.cell(x, 2) for x in (5, 4, 3)],
+                      STEPS.index(RIGHT))
+    arena.place_snake(1, [arena.cell(3, 1)], STEPS.index(DOWN))
+    assert arena.step() == [], 'Хвост уходит в том же тике, клетка свободна.'
+    assert arena.owner[arena.cell(3, 2)] == 1
+
+
+def test_self_and_rock_collisions():
+    arena = _arena(2, respawn=False)
+    arena.place_snake(0, [arena.cell(*xy) for xy in
+                          ((2, 2), (3, 2), (3, 3), (2, 3), (1, 3))],
+                      STEPS.index(DOWN))
+    arena.place_snake(1, [arena.cell(7, 1)], STEPS.index(UP))
+    arena.rocks.add(arena.cell(7, 0))
+    deaths = dict(arena.step())
+    assert deaths == {0: HIT_SELF, 1: HIT_ROCK}
+    assert not arena.snakes, 'Без возрождения погибшие покидают арену.'
+    assert FREE == min(arena.owner) == max(arena.owner)
+
+
+def test_arena_random_free_cell_finds_last_free_cell():
+    arena = Arena(7, 5, rng=Random(0), apples=0)
+    last = arena.cell(4, 2)
+    for cell in range(arena.width * arena.height):
+        if cell != last:
+            arena.rocks.add(cell)
+    assert arena.random_free_cell() == last, (
+        'На почти полном поле свободная клетка находится перебором.'
+    )
+    arena.rocks.add(last)
+    assert arena.random_free_cell() is None
+
+
+@pytest.mark.parametrize('respawn', (False, True))
+def test_outcome_does_not_depend_on_snake_order(respawn):
+    def play(reverse):
+        arena = Arena(12, 10, rng=Random(3), apples=12, rock_every=2,
+                      respawn=respawn)
+        for _ in range(30):
+            arena.add_snake()
+        if reverse:
+            arena.snakes = dict(reversed(arena.snakes.items()))
+        turns = Random(4)
+        deaths = []
+        for _ in range(40):
+            for snake_id in sorted(arena.snakes):
+                arena.turn(snake_id, turns.randrange(len(STEPS)))
+            deaths.append(arena.step())
+            assert all(arena.owner[cell] == FREE for cell in arena.apples), (
+                'Яблоко не должно появляться под змейкой.'
+            )
+        return deaths, set(arena.apples), bytes(arena.rocks.mask), {
+            snake_id: list(snake.body)
+            for snake_id, snake in arena.snakes.items()
+        }
+
+    assert play(False) == play(True), (
+        'Исход тика не должен зависеть от порядка змеек.'
+    )
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_new_rock_does_not_kill_head_of_same_tick(seed):
+    arena = Arena(6, 3, rng=Random(seed), apples=0, rock_every=1)
+    first = arena.add_snake()
+    second = arena.add_snake()
+    arena.place_snake(first, [arena.cell(0, 0)], STEPS.index(RIGHT))
+    arena.place_snake(second, [arena.cell(3, 1)], STEPS.index(RIGHT))
+    arena.apples.add(arena.cell(1, 0))
+    # Свободны только клетка, куда приходит голова второй змейки,
+    # и её хвост
+    for cell in range(arena.width * arena.height):
+        if cell not in (arena.cell(0, 0), arena.cell(1, 0), arena.cell(3, 1),
+                        arena.cell(4, 1)):
+            arena.rocks.add(cell)
+    assert arena.step() == [], (
+        'Камень не должен ложиться под голову, пришедшую в том же тике.'
+    )
+    assert arena.owner[arena.cell(4, 1)] == second
+    assert arena.rocks.mask[arena.cell(3, 1)]
+
+
+def test_cell_pool_behaves_like_set():
+    pool = CellPool([5, 1, 9])
+    pool.discard(1)
+    pool.discard(7)
+    pool.add(3)
+    assert pool == {5, 9, 3}
+    assert pool.choice(Random(0)) in pool
+    assert CellPool().choice(Random(0)) is None
+
+
+def test_owner_grid_matches_bodies():
+    arena = Arena(30, 20, rng=Random(1), apples=15, rock_every=3)
+    for _ in range(40):
+        arena.add_snake(GreedyPilot())
+    for _ in range(300):
+        arena.step()
+    expected = [FREE] * (arena.width * arena.height)
+    for snake_id, snake in arena.snakes.items():
+        for cell in snake.body:
+            expected[cell] = snake_id
+    assert list(arena.owner) == expected, (
+        'Сетка владельцев должна совпадать с телами змеек.'
+    )
+    assert sum(snake.score for snake in arena.snakes.values()) > 0
+
+
+@pytest.mark.benchmark
+def test_hundreds_of_snakes_tick_fast():
+    arena = Arena(200, 200, rng=Random(2), apples=300)
+    for _ in range(300):
+        arena.add_snake(GreedyPilot())
+    ticks = 100
+    start = time.perf_counter()
+    for _ in range(ticks):
+        arena.step()
+    assert (time.perf_counter() - start) / ticks < 0.02, (
+        'Тик арены с сотнями змеек должен укладываться в 20 мс.'
+    )
+
+
+def test_arena_view_draws_snakes_in_own_colors(_the_snake):
+    surface = pygame.Surface((_the_snake.SCREEN_WIDTH,
+                              _the_snake.SCREEN_HEIGHT))
+    arena = Arena(rng=Random(5), apples=10, track_changes=True)
+    for _ in range(8):
+        arena.add_snake(GreedyPilot())
+    view = _the_snake.ArenaView(arena)
+    for _ in range(30):
+        arena.step()
+        view.draw(surface)
+    _the_snake.dirty_rects.clear()
+    half = _the_snake.GRID_SIZE // 2
+    for snake_id, snake in arena.snakes.items():
+        for cell in snake.body:
+            x, y = _the_snake.to_pixels(cell)
+            color = _the_snake.ARENA_COLORS[
+                snake_id % len(_the_snake.ARENA_COLORS)
+            ]
+            assert surface.get_at((x + half, y + half))[:3] == color, (
+                'Каждая змейка арены рисуется своим цветом.'
+            )
+
+
+@pytest.mark.timeout(1, method='thread')
+@pytest.mark.usefixtures('modified_clock')
+def test_play_arena_runs(_the_snake):
+    try:
+        _the_snake.play_arena(snakes=20)
+    except StopInfiniteLoop:
+        pass
+
+
+def test_arena_view_draws_only_window_of_large_board(_the_snake):
+    surface = pygame.Surface((_the_snake.SCREEN_WIDTH,
+                              _the_snake.SCREEN_HEIGHT))
+    arena = Arena(500, 400, rng=Random(7), apples=50, track_changes=True)
+    for _ in range(200):
+        arena.add_snake(GreedyPilot())
+    view = _the_snake.ArenaView(arena)
+    view.draw(surface)
+    for _ in range(5):
+        arena.step()
+        view.draw(surface)
+    screen = surface.get_rect()
+    assert all(screen.contains(rect) for rect in _the_snake.dirty_rects), (
+        'Клетки за пределами окна не должны рисоваться.'
+    )
+    assert len(_the_snake.window_points(500, 400)) == (
+        _the_snake.GRID_WIDTH * _the_snake.GRID_HEIGHT
+    )
+    _the_snake.dirty_rects.clear()
+
+
+def test_arena_shares_board_helpers_with_game(_the_snake):
+    import snake_selfplay
+    import snake_server
+    arena = Arena(7, 5, rng=Random(0), apples=0)
+    assert isinstance(arena, Board) and issubclass(GameState, Board)
+    assert arena.cell(-1, 5) == GameState(7, 5).cell(-1, 5) == 6
+    assert arena.xy(arena.cell(3, 4)) == (3, 4)
+    assert _the_snake.SPEED == snake_server.SPEED == snake_selfplay.SPEED
+    assert snake_server.SPEED == SPEED, 'SPEED задаётся в одном месте.'
@@ -0,0 +1,94 @@
+import time
+from random import Random
+
+import pytest
+
+from snake_autopilot import (
+    CyclePilot, PathPilot, cycle_directions, distance_field, hamiltonian_cycle
+)
+from snake_engine import (
+    ATE, HIT_ROCK, HIT_SELF, RIGHT, STEPS, GameState, neighbour_table
+)
+
+
+@pytest.mark.parametrize('width, height', ((32, 24), (7, 4), (6, 5)))
+def test_cycle_visits_every_cell_by_adjacent_steps(width, height):
+    cycle = hamiltonian_cycle(width, height)
+    assert len(cycle) == len(set(cycle)) == width * height
+    neighbours = neighbour_table(width, height)
+    for index, cell in enumerate(cycle):
+        following = cycle[(index + 1) % len(cycle)]
+        assert any(table[cell] == following for table in neighbours), (
+            'Соседние клетки цикла должны быть соседями на поле.'
+        )
+
+
+def test_cycle_needs_even_side():
+    with pytest.raises(ValueError):
+        hamiltonian_cycle(5, 5)
+
+
+def test_cycle_pilot_falls_back_to_path_without_cycle():
+    game = GameState(33, 25, rng=Random(0))
+    pilot = CyclePilot()
+    for _ in range(200):
+        assert game.step(pilot.choose(game)) not in (HIT_SELF, HIT_ROCK), (
+            'Без гамильтонова цикла змейку должен вести PathPilot.'
+        )
+
+
+def test_distance_field_wraps_and_avoids_rocks():
+    game = GameState(8, 6, rng=Random(0))
+    game.clear_rocks()
+    field = distance_field(game, game.cell(0, 0))
+    assert field[game.cell(7, 0)] == 1, (
+        'Расстояния должны учитывать выход за край поля.'
+    )
+    game.add_rock(game.cell(7, 0))
+    field = distance_field(game, game.cell(0, 0))
+    assert field[game.cell(7, 0)] == -1
+    assert field[game.cell(7, 5)] == 2
+
+
+def test_cycle_pilot_never_hits_itself():
+    width, height = 8, 6
+    cycle = hamiltonian_cycle(width, height)
+    game = GameState(width, height, rng=Random(0))
+    game.place_apple(None)
+    length = width * height - 1
+    head = length - 1
+    heading = cycle_directions(width, height)[cycle[head - 1]]
+    game.place_snake([cycle[head - i] for i in range(length)],
+                     STEPS[heading])
+    pilot = CyclePilot()
+    for _ in range(3 * len(cycle)):
+        assert game.step(pilot.choose(game)) not in (HIT_SELF, HIT_ROCK), (
+            'Змейка на гамильтоновом цикле не должна врезаться в себя.'
+        )
+    assert game.length == length
+
+
+def test_path_pilot_reaches_apple_around_rocks():
+    game = GameState(8, 6, rng=Random(0))
+    x, y = game.xy(game.head)
+    game.place_snake([game.head], RIGHT)
+    game.place_apple(game.cell(x + 3, y))
+    game.add_rock(game.cell(x + 1, y))
+    pilot = PathPilot()
+    events = [game.step(pilot.choose(game)) for _ in range(6)]
+    assert ATE in events, 'Автопилот должен обойти камень и съесть яблоко.'
+    assert HIT_ROCK not in events
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize('pilot_class', (PathPilot, CyclePilot))
+def test_pilot_decides_fast(pilot_class):
+    game = GameState(32, 24, rng=Random(1))
+    pilot = pilot_class()
+    ticks = 2_000
+    start = time.perf_counter()
+    for _ in range(ticks):
+        game.step(pilot.choose(game))
+    assert (time.perf_counter() - start) / ticks < 0.001, (
+        'Выбор хода автопилотом должен занимать меньше миллисекунды.'
+    )
@@ -0,0 +1,52 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import snake_batch  # noqa: E402
+from snake_engine import STEPS, GameState  # noqa: E402
+
+
+class _ScriptedRandom:
+    """Отдаёт движку те же случайные клетки, что выпали в пакете."""
+
+    def __init__(self, game):
+        self.game = game
+        self.values = []
+
+    def randrange(self, stop):
+        return self.game._free_slot[self.values.pop(0)]
+
+    def choice(self, sequence):
+        return sequence[self.values.pop(0)]
+
+
+def test_batch_matches_single_game_rules():
+    batch = snake_batch.BatchGame(64, 8, 6, seed=1)
+    games = []
+    for board in range(batch.n):
+        game = GameState(8, 6)
+        game.place_apple(int(batch.apple[board]))
+        game.rng = _ScriptedRandom(game)
+        games.append(game)
+    rng = np.random.default_rng(2)
+    for _ in range(2000):
+        actions = rng.integers(-1, len(STEPS), size=batch.n)
+        events = batch.step(actions)
+        for board, game in enumerate(games):
+            script = game.rng.values
+            event = snake_batch.EVENTS[events[board]]
+            if batch.ate[board]:
+                if batch.new_rock[board] >= 0:
+                    script.append(int(batch.new_rock[board]))
+                script.append(int(batch.apple[board]))
+            if event in ('hit_self', 'hit_rock'):
+                script.append(int(batch.direction[board]))
+            action = int(actions[board])
+            assert game.step(STEPS[action] if action >= 0 else None) == event
+            assert game.length == batch.length[board]
+            assert list(game.body) == batch.positions(board)
+            assert game.direction == STEPS[batch.direction[board]]
+            assert game.rocks == {
+                int(cell) for cell in batch.rocks[board].nonzero()[0]
+            }
+    assert batch.length.max() > 1
@@ -0,0 +1,300 @@
+"""Замеры скорости игры.
+
+Запуск: `pytest -m benchmark`. Результаты пишутся в bench_output.json,
+сравниваются с tests/benchmark_baseline.json, и тест падает, если метрика
+стала хуже базовой больше чем на BENCHMARK_TOLERANCE. Чтобы перезаписать
+базу, задайте переменную окружения SNAKE_BENCHMARK_UPDATE=1.
+"""
+import json
+import os
+import time
+from pathlib import Path
+from random import Random
+
+import pygame
+import pytest
+
+from snake_arena import Arena, GreedyPilot
+from snake_autopilot import AUTOPILOTS, cycle_directions, hamiltonian_cycle
+from snake_engine import STEPS, GameState
+from snake_snapshot import SnapshotArchive, SnapshotWriter
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+OUTPUT_PATH = Path(__file__).resolve().parent.parent / 'bench_output.json'
+BENCHMARK_TOLERANCE = float(os.environ.get('SNAKE_BENCHMARK_TOLERANCE', 0.5))
+# Абсолютный запас для времён в микросекундном диапазоне, где шум больше
+BENCHMARK_SLACK_MS = 0.01
+
+SNAKE_LENGTHS = (1, 16, 128, 767, 768)
+ROCK_COUNTS = (16, 256, 700)
+
+pytestmark = pytest.mark.benchmark
+
+
+def _game_with_snake(module, length, track_changes=False):
+    """Партия без яблока, где змейка длины length идёт по циклу."""
+    width, height = module.GRID_WIDTH, module.GRID_HEIGHT
+    cycle = hamiltonian_cycle(width, height)
+    game = GameState(width, height, rng=Random(0),
+                     track_changes=track_changes)
+    game.place_apple(None)
+    following = [STEPS[heading]
+                 for heading in cycle_directions(width, height)]
+    head = length - 1
+    game.place_snake([cycle[head - i] for i in range(length)],
+                     following[cycle[head]])
+    return game, following
+
+
+def _best_time(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _calibrate():
+    """Время эталонного цикла: им нормируются метрики разных машин."""
+    return _best_time(lambda: sum(i * i for i in range(200_000)))
+
+
+@pytest.fixture(scope='module')
+def results():
+    measured = {'calibration_s': _calibrate(), 'metrics': {}}
+    yield measured
+    OUTPUT_PATH.write_text(json.dumps(measured, indent=2, sort_keys=True))
+    if os.environ.get('SNAKE_BENCHMARK_UPDATE'):
+        BASELINE_PATH.write_text(
+            json.dumps(measured, indent=2, sort_keys=True) + '\n'
+        )
+
+
+@pytest.fixture(scope='module')
+def surface(_the_snake):
+    pygame.init()
+    surface = _the_snake.init_display()
+    yield surface
+    pygame.quit()
+
+
+def _check(results, name, value, unit, higher_is_better):
+    """Запоминает метрику и сверяет её с базой с учётом скорости машины."""
+    results['metrics'][name] = {
+        'value': value, 'unit': unit, 'higher_is_better': higher_is_better,
+    }
+    if os.environ.get('SNAKE_BENCHMARK_UPDATE') or not BASELINE_PATH.exists():
+        return
+    baseline = json.loads(BASELINE_PATH.read_text())
+    if name not in baseline['metrics']:
+        return
+    scale = results['calibration_s'] / baseline['calibration_s']
+    expected = baseline['metrics'][name]['value']
+    if higher_is_better:
+        limit = expected / scale * (1 - BENCHMARK_TOLERANCE)
+        assert value >= limit, (
+            f'{name}: {value:.1f} {unit}, ожидалось не меньше {limit:.1f}'
+        )
+    else:
+        limit = (expected * scale * (1 + BENCHMARK_TOLERANCE)
+                 + BENCHMARK_SLACK_MS)
+        assert value <= limit, (
+            f'{name}: {value:.4f} {unit}, ожидалось не больше {limit:.4f}'
+        )
+
+
+@pytest.mark.parametrize('length', SNAKE_LENGTHS)
+def test_engine_step_rate(_the_snake, results, length):
+    game, following = _game_with_snake(_the_snake, length)
+    ticks = 20_000
+
+    def run():
+        step = game.step
+        for _ in range(ticks):
+            step(following[game.head])
+
+    rate = ticks / _best_time(run)
+    assert game.length == length
+    _check(results, f'engine_step[{length}]', rate, 'ticks/s', True)
+
+
+@pytest.mark.parametrize('length', SNAKE_LENGTHS)
+def test_snake_move_rate(_the_snake, results, length):
+    game, following = _game_with_snake(_the_snake, length)
+    snake = _the_snake.Snake(game)
+    ticks = 5_000
+
+    def run():
+        for _ in range(ticks):
+            snake.next_direction = following[game.head]
+            snake.move()
+
+    rate = ticks / _best_time(run)
+    _check(results, f'snake_move[{length}]', rate, 'ticks/s', True)
+
+
+@pytest.mark.parametrize('length', SNAKE_LENGTHS)
+def test_snake_draw_time(_the_snake, surface, results, length):
+    game, _ = _game_with_snake(_the_snake, length)
+    snake = _the_snake.Snake(game)
+    frames = 50
+
+    def run():
+        for _ in range(frames):
+            snake.draw(surface)
+            _the_snake.dirty_rects.clear()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, f'snake_draw[{length}]', frame_ms, 'ms/frame', False)
+
+
+@pytest.mark.parametrize('length', SNAKE_LENGTHS)
+def test_incremental_frame_time(_the_snake, surface, results, length):
+    game, following = _game_with_snake(_the_snake, length,
+                                       track_changes=True)
+    objects = (_the_snake.Rock(game), _the_snake.Snake(game),
+               _the_snake.Apple(game))
+    frames = 500
+
+    def run():
+        for _ in range(frames):
+            game.step(following[game.head])
+            _the_snake.draw_frame(surface, game, *objects)
+            _the_snake.dirty_rects.clear()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, f'tick_and_frame[{length}]', frame_ms, 'ms/frame',
+           False)
+
+
+@pytest.mark.parametrize('count', ROCK_COUNTS)
+def test_rock_draw_time(_the_snake, surface, results, count):
+    game = GameState(_the_snake.GRID_WIDTH, _the_snake.GRID_HEIGHT,
+                     rng=Random(0))
+    for _ in range(count):
+        game.add_rock(game.random_free_cell())
+    rock = _the_snake.Rock(game)
+    frames = 50
+
+    def run():
+        for _ in range(frames):
+            rock.draw(surface)
+            _the_snake.dirty_rects.clear()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, f'rock_draw[{count}]', frame_ms, 'ms/frame', False)
+
+
+def test_apple_draw_time(_the_snake, surface, results):
+    apple = _the_snake.Apple(GameState(_the_snake.GRID_WIDTH,
+                                       _the_snake.GRID_HEIGHT, rng=Random(0)))
+    frames = 2_000
+
+    def run():
+        for _ in range(frames):
+            apple.draw(surface)
+            _the_snake.dirty_rects.clear()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, 'apple_draw', frame_ms, 'ms/frame', False)
+
+
+@pytest.mark.parametrize('cells', (1, 3, 64))
+def test_display_update_time(_the_snake, surface, results, cells):
+    size = _the_snake.GRID_SIZE
+    rects = [pygame.Rect(i * size % surface.get_width(), 0, size, size)
+             for i in range(cells)]
+    frames = 200
+
+    def run():
+        for _ in range(frames):
+            pygame.display.update(rects)
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, f'display_update[{cells}]', frame_ms, 'ms/frame', False)
+
+
+def test_full_display_update_time(surface, results):
+    frames = 200
+
+    def run():
+        for _ in range(frames):
+            pygame.display.update()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, 'display_update[full]', frame_ms, 'ms/frame', False)
+
+
+@pytest.mark.parametrize('name', sorted(AUTOPILOTS))
+def test_autopilot_choose_time(_the_snake, results, name):
+    game = GameState(_the_snake.GRID_WIDTH, _the_snake.GRID_HEIGHT,
+                     rng=Random(0))
+    pilot = AUTOPILOTS[name]()
+    ticks = 5_000
+
+    def run():
+        for _ in range(ticks):
+            game.step(pilot.choose(game))
+
+    tick_ms = _best_time(run) / ticks * 1000
+    _check(results, f'autopilot[{name}]', tick_ms, 'ms/tick', False)
+
+
+@pytest.mark.parametrize('side', (100, 1000))
+def test_large_board_frame_time(_the_snake, surface, results, side):
+    game = GameState(side, side, rng=Random(0), track_changes=True)
+    for _ in range(side * side // 50):
+        game.add_rock(game.random_free_cell())
+    view = _the_snake.BoardView(game, _the_snake.Snake(game),
+                                _the_snake.Apple(game))
+    frames = 500
+
+    def run():
+        for _ in range(frames):
+            game.step()
+            view.draw_frame(surface)
+            _the_snake.dirty_rects.clear()
+
+    frame_ms = _best_time(run) / frames * 1000
+    _check(results, f'large_board_frame[{side}]', frame_ms, 'ms/frame',
+           False)
+
+
+@pytest.mark.parametrize('snakes', (10, 100, 500))
+def test_arena_tick_time(results, snakes):
+    arena = Arena(200, 200, rng=Random(0), apples=snakes)
+    for _ in range(snakes):
+        arena.add_snake(GreedyPilot())
+    ticks = 200
+
+    def run():
+        for _ in range(ticks):
+            arena.step()
+
+    tick_ms = _best_time(run) / ticks * 1000
+    _check(results, f'arena_tick[{snakes}]', tick_ms, 'ms/tick', False)
+
+
+def test_snapshot_archive_time(_the_snake, results, tmp_path):
+    game, following = _game_with_snake(_the_snake, 128)
+    path = tmp_path / 'games.snap'
+    snapshots = 1_000
+    with SnapshotWriter(path) as writer:
+        for _ in range(snapshots):
+            game.step(following[game.head])
+            writer.write(game)
+
+    def scan():
+        with SnapshotArchive(path) as archive:
+            assert len(archive) == snapshots
+
+    def restore():
+        with SnapshotArchive(path) as archive:
+            for index in range(0, snapshots, 10):
+                archive.restore(index)
+
+    _check(results, 'snapshot_scan[1000]', _best_time(scan) * 1000, 'ms',
+           False)
+    restore_ms = _best_time(restore) / (snapshots // 10) * 1000
+    _check(results, 'snapshot_restore', restore_ms, 'ms/game', False)
@@ -0,0 +1,83 @@
+from random import Random
+
+import pygame
+import pytest
+
+from conftest import StopInfiniteLoop
+from snake_autopilot import PathPilot
+from snake_engine import GameState
+
+
+@pytest.fixture
+def surface(_the_snake):
+    pygame.init()
+    yield _the_snake.init_display()
+    pygame.quit()
+
+
+def _large_game(_the_snake, rocks=200):
+    game = GameState(_the_snake.GRID_WIDTH * 3, _the_snake.GRID_HEIGHT * 3,
+                     rng=Random(3), track_changes=True)
+    for _ in range(rocks):
+        game.add_rock(game.random_free_cell())
+    return game
+
+
+def test_camera_follows_head_across_edge(_the_snake):
+    game = GameState(100, 80)
+    size = _the_snake.GRID_SIZE
+    camera = _the_snake.Camera(100, 80, width=32, height=24, margin=4)
+    assert not camera.follow(game.cell(10, 10))
+    assert camera.follow(game.cell(1, 1))
+    assert camera.to_view(game.cell(1, 1)) == (16 * size, 12 * size), (
+        'Камера должна ставить голову в центр окна и переходить через край.'
+    )
+    assert camera.to_view(game.cell(99, 79)) == (14 * size, 10 * size)
+    assert camera.to_view(game.cell(50, 40)) is None
+
+
+def test_camera_does_not_scroll_small_board(_the_snake):
+    camera = _the_snake.Camera(10, 8, width=32, height=24)
+    assert not camera.follow(79)
+    assert len(list(camera.cells())) == 10 * 8
+
+
+def test_background_cache_is_bounded(_the_snake, surface):
+    game = _large_game(_the_snake)
+    background = _the_snake.BackgroundChunks(game, size=8, limit=4)
+    camera = _the_snake.Camera(game.width, game.height)
+    for head in ((0, 0), (40, 30), (80, 60)):
+        camera.follow(game.cell(*head))
+        background.draw(surface, camera)
+    assert len(background.chunks) == 4, (
+        'Кэш фона не должен расти вместе с размером поля.'
+    )
+
+
+def test_incremental_view_matches_full_redraw(_the_snake, surface):
+    game = _large_game(_the_snake)
+    snake = _the_snake.Snake(game, autopilot=PathPilot())
+    apple = _the_snake.Apple(game)
+    view = _the_snake.BoardView(game, snake, apple)
+    for _ in range(300):
+        snake.move()
+        view.draw_frame(surface)
+    _the_snake.dirty_rects.clear()
+    expected = pygame.Surface(surface.get_size())
+    reference = _the_snake.BoardView(game, snake, apple,
+                                     camera=view.camera)
+    reference.draw_frame(expected)
+    _the_snake.dirty_rects.clear()
+    assert (pygame.image.tobytes(expected, 'RGB')
+            == pygame.image.tobytes(surface, 'RGB')), (
+        'Перерисовка изменений должна давать тот же кадр, что и полная.'
+    )
+
+
+@pytest.mark.timeout(1, method='thread')
+@pytest.mark.usefixtures('modified_clock')
+def test_main_runs_on_large_board(_the_snake):
+    try:
+        _the_snake.main(board=(200, 150), autopilot='cycle')
+    except StopInfiniteLoop:
+        pass
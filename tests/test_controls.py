@@ -0,0 +1,26 @@
+def test_quick_double_turn_is_kept(_the_snake, snake):
+    assert snake.direction == _the_snake.RIGHT
+    snake.queue_turn(_the_snake.UP)
+    snake.queue_turn(_the_snake.LEFT)
+    snake.move()
+    assert snake.direction == _the_snake.UP
+    snake.move()
+    assert snake.direction == _the_snake.LEFT, (
+        'Быстрые повороты должны применяться по одному за тик.'
+    )
+
+
+def test_reverse_turn_is_not_queued(_the_snake, snake):
+    snake.queue_turn(_the_snake.LEFT)
+    assert not snake.turns
+
+
+def test_fixed_timestep_runs_ticks_by_elapsed_time(_the_snake):
+    scheduler = _the_snake.FixedTimestep(rate=10, max_ticks=5)
+    assert scheduler.advance(50) == 0
+    assert scheduler.advance(60) == 1
+    assert round(scheduler.alpha, 6) == 0.1
+    assert scheduler.advance(1000) == 5, (
+        'При отставании планировщик должен ограничивать число тиков за кадр.'
+    )
+    assert scheduler.dropped > 0
@@ -0,0 +1,119 @@
+from random import Random
+
+import pytest
+
+import snake_engine
+from snake_engine import ATE, HIT_ROCK, HIT_SELF, LEFT, MOVED, RIGHT, UP
+
+
+@pytest.fixture
+def game():
+    return snake_engine.GameState(8, 6, rng=Random(0))
+
+
+def test_engine_does_not_import_pygame():
+    assert not hasattr(snake_engine, 'pygame'), (
+        'Модуль `snake_engine` не должен зависеть от pygame.'
+    )
+
+
+def test_step_wraps_around_board(game):
+    start = game.head
+    for _ in range(game.width):
+        game.place_apple(None)
+        assert game.step() == MOVED
+    assert game.head == start, (
+        'Змейка должна выходить с другой стороны поля.'
+    )
+
+
+def test_reverse_turn_is_ignored(game):
+    assert game.direction == RIGHT
+    game.step(LEFT)
+    assert game.direction == RIGHT, (
+        'Змейка не должна разворачиваться в обратную сторону.'
+    )
+
+
+def test_eating_grows_snake_and_spawns_rock(game):
+    for length in range(2, 5):
+        x, y = game.xy(game.head)
+        game.place_apple(game.cell(x + 1, y))
+        game.clear_rocks()
+        assert game.step() == ATE
+        assert game.length == len(game.body) == length
+    assert len(game.body) == len(set(game.body))
+    assert len(game.rocks) == 1, (
+        'Каждое четвёртое яблоко должно добавлять камень.'
+    )
+
+
+def test_rock_hit_resets_game(game):
+    x, y = game.xy(game.head)
+    game.add_rock(game.cell(x + 1, y))
+    assert game.step() == HIT_ROCK
+    assert game.head == game.start_cell
+    assert not game.rocks
+
+
+def test_self_collision_resets_game(game):
+    x, y = game.xy(game.head)
+    for dx in range(1, 5):
+        game.place_apple(game.cell(x + dx, y))
+        game.step()
+    game.place_apple(None)
+    game.clear_rocks()
+    game.step(UP)
+    game.step(LEFT)
+    assert game.step(snake_engine.DOWN) == HIT_SELF
+    assert game.length == 1
+
+
+def test_spawns_only_on_free_cells(game):
+    for _ in range(500):
+        game.step(game.rng.choice(snake_engine.STEPS))
+        assert game.apple not in game.rocks
+        assert not game.rocks & set(game.body)
+        free = (set(range(game.width * game.height))
+                - set(game.body) - game.rocks - {game.apple})
+        assert all(game.is_free(cell) for cell in free)
+        assert len(game._free) == len(free)
+
+
+def test_neighbour_table_wraps_around_board(game):
+    up, down, left, right = snake_engine.neighbour_table(8, 6)
+    corner = game.cell(0, 0)
+    assert up[corner] == game.cell(0, 5)
+    assert left[corner] == game.cell(7, 0)
+    assert right[game.cell(7, 5)] == game.cell(0, 5)
+    assert down[game.cell(7, 5)] == game.cell(7, 0), (
+        'Соседи по таблице должны учитывать переход через край поля.'
+    )
+
+
+def test_copy_is_independent(game):
+    for _ in range(50):
+        game.step(game.rng.choice(snake_engine.STEPS))
+    copy = game.copy()
+    assert list(copy.body) == list(game.body)
+    assert copy.rocks == game.rocks and copy.apple == game.apple
+    for _ in range(50):
+        action = game.rng.choice(snake_engine.STEPS)
+        assert copy.step(action) == game.step(action), (
+            'Копия должна продолжать партию так же, как оригинал.'
+        )
+    copy.add_rock(copy.random_free_cell())
+    assert copy.rocks != game.rocks
+
+
+def test_obstacle_layer_behaves_like_set(game):
+    layer = snake_engine.ObstacleLayer(game.width * game.height)
+    for cell in (3, 17, 40, 17):
+        layer.add(cell)
+    assert len(layer) == 3 and layer == {3, 17, 40}
+    assert 17 in layer and 4 not in layer and None not in layer
+    assert layer & {3, 4} == {3}
+    packed = layer.to_bits()
+    assert len(packed) == game.width * game.height // 8
+    restored = snake_engine.ObstacleLayer.from_bits(len(layer.mask), packed)
+    assert restored == layer, 'Упакованная маска должна читаться обратно.'
@@ -0,0 +1,159 @@
+import struct
+import time
+from functools import partial
+from random import Random
+
+import numpy as np
+import pygame
+import pytest
+
+from snake_autopilot import PathPilot
+from snake_engine import GameState
+
+
+@pytest.fixture
+def export(_the_snake):
+    import snake_export
+    yield snake_export
+    _the_snake.dirty_rects.clear()
+
+
+def _render(the_snake, ticks, seed=0):
+    game = GameState(rng=Random(seed), track_changes=True)
+    surface = pygame.Surface((the_snake.SCREEN_WIDTH,
+                              the_snake.SCREEN_HEIGHT))
+    snake = the_snake.Snake(game, autopilot=PathPilot())
+    draw = partial(the_snake.draw_frame, surface, game, the_snake.Rock(game),
+                   snake, the_snake.Apple(game))
+    draw()
+    for _ in range(ticks):
+        snake.move()
+        draw()
+    the_snake.dirty_rects.clear()
+    return surface
+
+
+def _lzw_decode(data):
+    """Простой декодер LZW из GIF для проверки кадров."""
+    bits = np.unpackbits(np.frombuffer(data, np.uint8), bitorder='little')
+    position = 0
+    width = 9
+    table = None
+    previous = None
+    pixels = []
+    while True:
+        code = int(bits[position:position + width] @ (1 << np.arange(width)))
+        position += width
+        if code == 256:
+            table = [[index] for index in range(258)]
+            width = 9
+            previous = None
+            continue
+        if code == 257:
+            return pixels
+        if previous is None:
+            entry = table[code]
+        else:
+            entry = (table[code] if code < len(table)
+                     else table[previous] + table[previous][:1])
+            table.append(table[previous] + entry[:1])
+            if len(table) == 1 << width and width < 12:
+                width += 1
+        pixels += entry
+        previous = code
+
+
+def _gif_frames(data):
+    """Кадры GIF: (left, top, width, height, индексы, пауза)."""
+    palette = np.frombuffer(data[13:13 + 768], np.uint8).reshape(256, 3)
+    position = 13 + 768
+    frames = []
+    delay = None
+    while data[position] != 0x3B:
+        if data[position] == 0x21:
+            if data[position + 1] == 0xF9:
+                (delay,) = struct.unpack_from('<H', data, position + 4)
+            position += 2
+            while data[position]:
+                position += data[position] + 1
+            position += 1
+            continue
+        left, top, width, height = struct.unpack_from('<HHHH', data,
+                                                      position + 1)
+        position += 11
+        blocks = bytearray()
+        while data[position]:
+            blocks += data[position + 1:position + 1 + data[position]]
+            position += data[position] + 1
+        position += 1
+        indices = np.array(_lzw_decode(bytes(blocks)), np.uint8)
+        frames.append((left, top, width, height,
+                       indices.reshape(height, width), delay))
+    return palette, frames
+
+
+def test_png_sequence_matches_rendered_frames(export, _the_snake, tmp_path):
+    frames = export.export_game(tmp_path, 20, seed=3, workers=2)
+    assert frames == 21, 'Начальный кадр и по кадру на каждый тик.'
+    files = sorted(tmp_path.glob('frame_*.png'))
+    assert len(files) == frames
+    expected = _render(_the_snake, 20, seed=3)
+    image = pygame.image.load(str(files[-1]))
+    assert (pygame.image.tobytes(image, 'RGB')
+            == pygame.image.tobytes(expected, 'RGB')), (
+        'Последний PNG-кадр должен совпадать с кадром игры.'
+    )
+
+
+def test_gif_frames_rebuild_game(export, _the_snake, tmp_path):
+    path = tmp_path / 'game.gif'
+    export.export_game(path, 30, seed=5, workers=2)
+    data = path.read_bytes()
+    first = pygame.image.load(str(path))
+    assert first.get_size() == (_the_snake.SCREEN_WIDTH,
+                                _the_snake.SCREEN_HEIGHT)
+    palette, frames = _gif_frames(data)
+    assert len(frames) == 31
+    assert frames[1][2] * frames[1][3] < first.get_width() * first.get_height(
+    ), 'Кадры после первого должны хранить только изменившуюся область.'
+    assert {frame[-1] for frame in frames} == {100 // _the_snake.SPEED}
+    canvas = np.zeros((first.get_height(), first.get_width()), np.uint8)
+    for left, top, width, height, indices, _ in frames:
+        canvas[top:top + height, left:left + width] = indices
+    expected = pygame.surfarray.array3d(_render(_the_snake, 30, seed=5))
+    assert (palette[canvas] == expected.transpose(1, 0, 2)).all(), (
+        'Кадры GIF, наложенные друг на друга, должны давать кадр игры.'
+    )
+
+
+def test_run_codes_decode_back(export):
+    rng = np.random.default_rng(0)
+    runs = rng.integers(1, 70, 2_000)
+    pixels = np.repeat(rng.integers(0, 5, len(runs)), runs).astype(np.uint8)
+    pixels = np.concatenate([pixels, np.zeros(80_000, np.uint8), [7]])
+    codes = np.append(export._run_codes(pixels), 257)
+    assert codes.max() < 512, 'Коды LZW должны оставаться 9-битными.'
+    data = np.packbits(((codes[:, None] >> np.arange(9)) & 1).astype(
+        np.uint8).ravel(), bitorder='little').tobytes()
+    assert _lzw_decode(data) == pixels.tolist()
+    assert len(codes) < len(pixels) / 4, 'Отрезки одного цвета сжимаются.'
+
+
+@pytest.mark.benchmark
+def test_export_runs_faster_than_real_time(export, _the_snake, tmp_path):
+    ticks = 100
+    start = time.perf_counter()
+    export.export_game(tmp_path / 'fast.gif', ticks)
+    elapsed = time.perf_counter() - start
+    assert elapsed < ticks / _the_snake.SPEED / 4, (
+        'Выгрузка не должна ждать clock.tick и идти в темпе игры.'
+    )
+
+
+def test_exporter_without_encoder_fails_on_creation(export):
+    class Incomplete(export.FrameExporter):
+        def write(self, data):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete((10, 10), workers=1)
@@ -0,0 +1,94 @@
+from collections import deque
+from random import Random
+
+import pygame
+import pytest
+
+from conftest import StopInfiniteLoop
+from snake_engine import GameState, neighbour_table
+from snake_levels import (
+    LEVEL_DENSITY, START_CLEARANCE, generate_level, level_game
+)
+
+
+def test_level_is_deterministic_and_cached():
+    level = generate_level(32, 24, 5)
+    assert level == generate_level.__wrapped__(32, 24, 5)
+    assert generate_level(32, 24, 5) is level, (
+        'Повторная загрузка уровня должна брать маску из кэша.'
+    )
+    assert generate_level(32, 24, 6) != level
+    assert level.count(1) > 0
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_level_keeps_start_clear_and_free_cells_reachable(seed):
+    width, height = 32, 24
+    level = generate_level(width, height, seed)
+    start_x, start_y = width // 2 - 1, height // 2 - 1
+    for dy in range(-START_CLEARANCE, START_CLEARANCE + 1):
+        for dx in range(-START_CLEARANCE, START_CLEARANCE + 1):
+            assert not level[(start_y + dy) * width + start_x + dx]
+    start = start_y * width + start_x
+    reached = {start}
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        for table in neighbour_table(width, height):
+            if table[cell] not in reached and not level[table[cell]]:
+                reached.add(table[cell])
+                queue.append(table[cell])
+    assert len(reached) == level.count(0), (
+        'Все свободные клетки уровня должны быть достижимы со старта.'
+    )
+
+
+@pytest.mark.timeout(2, method='thread')
+@pytest.mark.parametrize('width, height, density', [
+    (6, 6, LEVEL_DENSITY), (4, 3, LEVEL_DENSITY), (32, 24, 0.95),
+])
+def test_level_generation_stops_without_free_cells(width, height, density):
+    level = generate_level(width, height, 1, density)
+    assert len(level) == width * height
+    assert level.count(0) > 0, 'Клетка появления змейки остаётся свободной.'
+
+
+def test_reset_restores_level_rocks():
+    game = level_game(3, 16, 12, rng=Random(0))
+    level = set(game.rocks)
+    assert level and game.apple not in game.rocks
+    game.add_rock(game.random_free_cell())
+    game.reset()
+    assert set(game.rocks) == level, (
+        'После сброса должны остаться только камни уровня.'
+    )
+    assert all(not game.is_free(cell) for cell in level)
+
+
+def test_rock_layer_is_updated_with_new_rocks(_the_snake):
+    pygame.init()
+    surface = _the_snake.init_display()
+    game = GameState(_the_snake.GRID_WIDTH, _the_snake.GRID_HEIGHT,
+                     rng=Random(0), track_changes=True)
+    rock = _the_snake.Rock(game)
+    rock.draw(surface)
+    game.add_rock(game.random_free_cell())
+    cells = game.pop_changes()
+    rock.draw(surface, cells)
+    expected = pygame.Surface(surface.get_size())
+    _the_snake.Rock(game).draw(expected)
+    _the_snake.dirty_rects.clear()
+    assert (pygame.image.tobytes(expected, 'RGB')
+            == pygame.image.tobytes(surface, 'RGB')), (
+        'Новый камень должен дорисовываться в готовый слой камней.'
+    )
+    pygame.quit()
+
+
+@pytest.mark.timeout(1, method='thread')
+@pytest.mark.usefixtures('modified_clock')
+def test_main_runs_on_level(_the_snake):
+    try:
+        _the_snake.main(level=1)
+    except StopInfiniteLoop:
+        pass
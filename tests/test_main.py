@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 import pytest
 
 from conftest import StopInfiniteLoop
@@ -16,3 +19,34 @@ def test_main_run_without_exceptions(_the_snake):
             f'`{type(error).__name__}: {error}`\n\n'
             'Убедитесь, что функция работает корректно.'
         )
+
+
+def test_import_skips_network_arena_and_snapshot_modules():
+    modules = ('asyncio', 'mmap', 'snake_arena', 'snake_server',
+               'snake_snapshot')
+    code = ('import sys, the_snake; '
+            f'print(*[name for name in {modules} if name in sys.modules])')
+    result = subprocess.run([sys.executable, '-c', code], check=True,
+                            capture_output=True, text=True)
+    assert result.stdout.splitlines()[-1].strip() == '', (
+        'Сетевая игра, арена и снимки должны импортироваться при запуске, '
+        'а не при импорте the_snake.'
+    )
+
+
+def test_cli_passes_options_to_main(_the_snake, monkeypatch):
+    calls = []
+    monkeypatch.setattr(_the_snake, 'main', lambda **kwargs: calls.append(
+        kwargs))
+    _the_snake.cli(['--autopilot', 'path', '--board', '64', '48',
+                    '--level', '3', '--record', 'game.replay',
+                    '--snapshot', 'game.snap', '--telemetry', 'events.jsonl',
+                    '--profile'])
+    _the_snake.cli([])
+    assert calls == [
+        dict(record='game.replay', profile=True, telemetry='events.jsonl',
+             autopilot='path', board=(64, 48), level=3,
+             snapshot='game.snap'),
+        dict(record=None, profile=False, telemetry=None, autopilot=None,
+             board=None, level=None, snapshot=None),
+    ], 'Параметры командной строки должны доходить до main.'
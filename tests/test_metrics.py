@@ -0,0 +1,46 @@
+import json
+from array import array
+
+import pytest
+
+from conftest import StopInfiniteLoop
+from snake_metrics import LOGIC, FrameTimer
+
+
+def test_frame_timer_keeps_only_last_frames():
+    timer = FrameTimer(size=4)
+    for _ in range(10):
+        timer.start()
+        timer.mark(LOGIC)
+        timer.end()
+    assert timer.count == 4
+    assert timer.percentile(LOGIC, 99) >= timer.percentile(LOGIC, 50) >= 0
+
+
+def test_frame_timer_percentiles():
+    timer = FrameTimer(size=100)
+    timer.samples[LOGIC] = array('d', [i / 1000 for i in range(100)])
+    timer.count = 100
+    assert timer.percentile(LOGIC, 50) == pytest.approx(50)
+    assert timer.percentile(LOGIC, 99) == pytest.approx(99)
+
+
+def test_frame_timer_saves_summary(tmp_path):
+    timer = FrameTimer(size=10)
+    timer.start()
+    timer.mark(LOGIC)
+    timer.end()
+    path = tmp_path / 'frames.json'
+    timer.save(path)
+    assert json.loads(path.read_text()) == timer.summary(), (
+        'Сводка замеров должна сохраняться в файл, а не в stdout.'
+    )
+
+
+@pytest.mark.timeout(1, method='thread')
+@pytest.mark.usefixtures('modified_clock')
+def test_main_runs_with_profiling(_the_snake):
+    try:
+        _the_snake.main(profile=True)
+    except StopInfiniteLoop:
+        pass
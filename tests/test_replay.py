@@ -0,0 +1,67 @@
+from random import Random
+
+import pytest
+
+from snake_engine import STEPS
+from snake_replay import RecordedGame, Replay, ReplayDivergence, ReplayError
+
+
+@pytest.fixture
+def recorded():
+    game = RecordedGame(seed=7, width=10, height=8)
+    moves = Random(1)
+    for _ in range(1000):
+        game.step(moves.choice(STEPS) if moves.random() < 0.3 else None)
+    return game
+
+
+def test_replay_reproduces_game(recorded):
+    replay = Replay.from_bytes(recorded.to_replay().to_bytes())
+    game = replay.play()
+    assert game.ticks == recorded.ticks
+    assert list(game.body) == list(recorded.body)
+    assert game.apple == recorded.apple
+    assert game.rocks == recorded.rocks
+
+
+def test_replay_detects_divergence(recorded):
+    replay = recorded.to_replay()
+    tick, direction = replay.turns[0]
+    replay.turns[0] = (tick, STEPS.index(STEPS[direction - 1]))
+    with pytest.raises(ReplayDivergence):
+        replay.play()
+
+
+@pytest.mark.timeout(5, method='thread')
+def test_play_replay_shows_large_board_through_camera(_the_snake, tmp_path):
+    game = RecordedGame(seed=3, width=1000, height=1000, track_changes=True)
+    for _ in range(20):
+        game.step()
+    path = tmp_path / 'large.snake'
+    game.to_replay().save(path)
+    # Без камеры слой камней был бы поверхностью 20000x20000
+    _the_snake.play_replay(path, speed=None)
+
+
+def test_rock_layer_is_drawn_in_window_sized_chunks(_the_snake):
+    game = RecordedGame(seed=3, width=1000, height=1000, track_changes=True)
+    rock = _the_snake.Rock(game)
+    surface = _the_snake.pygame.Surface((_the_snake.SCREEN_WIDTH,
+                                         _the_snake.SCREEN_HEIGHT))
+    rock.draw(surface)
+    _the_snake.dirty_rects.clear()
+    limit = _the_snake.CHUNK_CELLS * _the_snake.GRID_SIZE
+    assert all(chunk.get_width() <= limit and chunk.get_height() <= limit
+               for chunk in rock.layer.chunks.values()), (
+        'Слой камней большого поля не должен рисоваться одним куском.'
+    )
+
+
+def test_truncated_replay_raises_replay_error(recorded):
+    data = recorded.to_replay().to_bytes()
+    for size in (0, 3, 4, 5, 8, len(data) - 5, len(data) - 1):
+        with pytest.raises(ReplayError):
+            Replay.from_bytes(data[:size])
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(data + b'\x00')
+
@@ -0,0 +1,50 @@
+import json
+
+import snake_selfplay
+from snake_engine import HIT_ROCK, HIT_SELF, GameState
+
+
+def test_game_is_deterministic_from_seed():
+    first = snake_selfplay.play_game(7, max_ticks=3_000)
+    second = snake_selfplay.play_game(7, max_ticks=3_000)
+    assert first == second, 'Партия должна полностью задаваться зерном.'
+    seed, score, length, ticks, cause = first
+    assert seed == 7 and score == length - 1
+    assert cause in (HIT_SELF, HIT_ROCK, snake_selfplay.TIMEOUT)
+
+
+def test_game_without_rocks_never_hits_rock():
+    for seed in range(5):
+        *_, cause = snake_selfplay.play_game(seed, rock_every=0,
+                                             max_ticks=2_000)
+        assert cause != HIT_ROCK
+
+
+def test_rock_every_zero_disables_rocks():
+    game = GameState(8, 6, rock_every=0)
+    for _ in range(8):
+        x, y = game.xy(game.head)
+        game.place_apple(game.cell(x + 1, y))
+        game.step()
+    assert not game.rocks, 'При rock_every=0 камни не должны появляться.'
+
+
+def test_summary_does_not_depend_on_workers(tmp_path):
+    options = {'max_ticks': 500, 'width': 8, 'height': 6}
+    serial = snake_selfplay.run(10, seed=3, workers=1, batch=3, **options)
+    parallel = snake_selfplay.run(10, seed=3, workers=2, batch=4, **options)
+    for key in ('games', 'score', 'length', 'ticks', 'causes'):
+        assert serial[key] == parallel[key], (
+            'Сводка не должна зависеть от числа процессов и размера пачки.'
+        )
+    assert serial['games'] == sum(serial['causes'].values()) == 10
+
+
+def test_cli_writes_summary(tmp_path):
+    output = tmp_path / 'summary.json'
+    snake_selfplay.main(['--games', '4', '--workers', '1', '--pilot',
+                         'cycle', '--max-ticks', '200',
+                         '--output', str(output)])
+    summary = json.loads(output.read_text())
+    assert summary['games'] == 4
+    assert summary['options']['pilot'] == 'cycle'
@@ -0,0 +1,177 @@
+import asyncio
+import socket
+import threading
+from random import Random
+
+import pygame
+import pytest
+
+from conftest import StopInfiniteLoop
+from snake_arena import FREE
+from snake_engine import STEPS
+from snake_server import (
+    GameServer, MessageReader, ProtocolError, RemoteBoard, RemoteClient,
+    SharedBoard, frame
+)
+
+
+def _mirror(board, player_id=0):
+    remote = RemoteBoard()
+    remote.feed(board.hello(player_id) + board.snapshot())
+    return remote
+
+
+def _assert_same(remote, board):
+    assert remote.ticks == board.ticks
+    assert remote.apples == board.apples
+    assert remote.rocks.mask == board.rocks.mask
+    assert remote.occupied == bytes(owner != FREE for owner in board.owner)
+    assert {snake_id: list(body) for snake_id, body
+            in remote.bodies.items()} == {
+        snake_id: list(snake.body)
+        for snake_id, snake in board.snakes.items() if snake.body
+    }, 'Зеркало клиента должно совпадать с полем сервера.'
+
+
+def test_message_reader_handles_split_stream():
+    data = frame(b'a' * 200) + frame(b'bc') + frame(b'')
+    reader = MessageReader()
+    messages = []
+    for index in range(len(data)):
+        messages += reader.feed(data[index:index + 1])
+    assert messages == [b'a' * 200, b'bc', b'']
+    assert not reader.buffer
+
+
+def test_deltas_rebuild_server_board():
+    rng = Random(5)
+    board = SharedBoard(12, 10, rng=Random(1), apples=6, rock_every=2)
+    for _ in range(4):
+        board.add_snake()
+    remote = _mirror(board)
+    for _ in range(500):
+        for snake_id in board.snakes:
+            if rng.random() < 0.3:
+                board.turn(snake_id, rng.randrange(len(STEPS)))
+        board.step()
+        remote.feed(board.pop_delta())
+    _assert_same(remote, board)
+    assert board.rocks, 'За 500 тиков на поле должны появиться камни.'
+
+
+def test_delta_size_does_not_depend_on_board():
+    board = SharedBoard(1000, 1000, rng=Random(2), apples=0)
+    for _ in range(10):
+        board.add_snake()
+    board.pop_delta()
+    board.step()
+    # Тип, тик и по ходу на змейку: код, игрок и клетка в трёх байтах
+    assert len(board.pop_delta()) <= 3 + 10 * 5, (
+        'Размер изменений за тик не должен зависеть от размера поля.'
+    )
+
+
+def test_rejects_unknown_message():
+    remote = RemoteBoard()
+    with pytest.raises(ProtocolError):
+        remote.feed(frame(b'\x7f'))
+
+
+def test_players_play_over_loopback():
+    async def scenario():
+        server = GameServer(SharedBoard(16, 12, rng=Random(4)), rate=200)
+        host, port = await server.start(port=0)
+        first = await RemoteClient.connect(host, port)
+        second = await RemoteClient.connect(host, port)
+        # Поворот под прямым углом к текущему направлению
+        first.turn(STEPS[first.board.heading ^ 2])
+        await asyncio.sleep(0.01)
+        await server.run(ticks=20)
+        for client in (first, second):
+            await client.wait_tick(server.board.ticks)
+            _assert_same(client.board, server.board)
+        assert second.board.player in first.board.bodies
+        await first.close()
+        await asyncio.sleep(0.01)
+        server.tick()
+        await second.wait_tick(server.board.ticks)
+        assert first.board.player not in second.board.bodies, (
+            'Отключившийся игрок должен исчезнуть у остальных.'
+        )
+        await second.close()
+        await server.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+@pytest.mark.timeout(1, method='thread')
+@pytest.mark.usefixtures('modified_clock')
+def test_online_client_draws_board(_the_snake):
+    board = SharedBoard(rng=Random(6))
+    player_id = board.add_snake()
+    board.add_snake()
+    listener = socket.create_server(('127.0.0.1', 0))
+    host, port = listener.getsockname()
+
+    def serve_one():
+        connection, _ = listener.accept()
+        connection.sendall(board.hello(player_id) + board.snapshot())
+        connection.recv(1)
+        connection.close()
+
+    thread = threading.Thread(target=serve_one)
+    thread.start()
+    # Часы игры помнят время прошлого запуска pygame, а отсчёт SDL после
+    # pygame.quit начинается заново: без сброса первый tick ждёт
+    pygame.init()
+    _the_snake.clock.clock.tick()
+    try:
+        _the_snake.play_online(host, port)
+    except StopInfiniteLoop:
+        pass
+    finally:
+        thread.join()
+        listener.close()
+    snake = board.snakes[player_id]
+    ahead = board.neighbours[snake.heading][snake.body[0]]
+    for cell in (snake.body[0], ahead):
+        x, y = _the_snake.to_pixels(cell)
+        size = _the_snake.GRID_SIZE
+        pixel = _the_snake.screen.get_at((x + size // 2, y + size // 2))
+        assert pixel[:3] == _the_snake.SNAKE_COLOR, (
+            'Клиент должен нарисовать свою змейку и её следующий шаг.'
+        )
+    pygame.quit()
+
+
+@pytest.mark.timeout(2, method='thread')
+def test_online_client_returns_when_server_closes_early(_the_snake):
+    listener = socket.create_server(('127.0.0.1', 0))
+    host, port = listener.getsockname()
+
+    def close_one():
+        connection, _ = listener.accept()
+        connection.close()
+
+    thread = threading.Thread(target=close_one)
+    thread.start()
+    try:
+        _the_snake.play_online(host, port)
+    finally:
+        thread.join()
+        listener.close()
+
+
+def test_online_player_treats_reset_as_disconnect(_the_snake):
+    class ResetSocket:
+        def recv(self, size):
+            raise ConnectionResetError
+
+        def send(self, data):
+            raise BrokenPipeError
+
+    player = _the_snake.OnlinePlayer(ResetSocket(), _mirror(SharedBoard()))
+    player.queue_turn(_the_snake.UP)
+    assert player.receive() is False, (
+        'Сброс соединения означает, что сервер отключился.'
+    )
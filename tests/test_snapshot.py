@@ -0,0 +1,111 @@
+from random import Random
+
+import pytest
+
+from snake_autopilot import PathPilot
+from snake_engine import GameState
+from snake_levels import level_game
+from snake_snapshot import (
+    SnapshotArchive, SnapshotError, SnapshotWriter, dump_game, load_game,
+    read_info
+)
+
+
+@pytest.fixture
+def played():
+    game = level_game(3, 32, 24, rng=Random(1))
+    pilot = PathPilot()
+    for _ in range(2_000):
+        game.step(pilot.choose(game))
+    return game
+
+
+def test_restored_game_continues_identically(played):
+    restored = load_game(dump_game(played))
+    assert list(restored.body) == list(played.body)
+    assert restored.rocks.mask == played.rocks.mask
+    assert restored.level == played.level
+    assert (restored.apple, restored.heading, restored.ticks) == (
+        played.apple, played.heading, played.ticks
+    )
+    original = played.copy()
+    first, second = PathPilot(), PathPilot()
+    for _ in range(1_000):
+        assert (original.step(first.choose(original))
+                == restored.step(second.choose(restored))), (
+            'Восстановленная партия должна идти тик в тик как исходная.'
+        )
+    assert list(restored.body) == list(original.body)
+
+
+def test_snapshot_is_bit_packed():
+    game = GameState(rng=Random(0))
+    body = [game.cell(x, 5) for x in range(20, 0, -1)]
+    game.place_snake(body, (1, 0))
+    data = dump_game(game)
+    # Генератор - 2.5 КБ, камни - 96 байт на 768 клеток, тело - 4 байта
+    # головы и 5 байт на 19 сегментов, свободные клетки - по 2 байта
+    assert len(data) <= 64 + 2_508 + 96 + 9 + 2 * len(game.free_cells)
+    assert list(load_game(data).body) == body
+
+
+def test_archive_scans_headers_and_skips_torn_tail(tmp_path, played):
+    path = tmp_path / 'games.snap'
+    with SnapshotWriter(path) as writer:
+        for _ in range(3):
+            played.step()
+            writer.write(played)
+    with open(path, 'ab') as file:
+        file.write(dump_game(played)[:100])
+    with SnapshotArchive(path) as archive:
+        assert len(archive) == 3, 'Оборванный снимок должен отбрасываться.'
+        assert [info.ticks for info in archive] == [
+            played.ticks - 2, played.ticks - 1, played.ticks
+        ]
+        restored = archive.restore(1)
+    assert restored.ticks == played.ticks - 1
+
+
+def test_corrupted_snapshot_is_rejected(played):
+    data = bytearray(dump_game(played))
+    data[-1] ^= 0xFF
+    read_info(data)
+    with pytest.raises(SnapshotError):
+        load_game(data)
+    with pytest.raises(SnapshotError):
+        load_game(b'NOPE' + bytes(data[4:]))
+
+
+def test_empty_archive(tmp_path):
+    path = tmp_path / 'empty.snap'
+    path.touch()
+    with SnapshotArchive(path) as archive:
+        assert len(archive) == 0
+        with pytest.raises(SnapshotError):
+            archive.restore()
+
+
+def test_create_game_resumes_from_snapshot(_the_snake, tmp_path, played):
+    path = tmp_path / 'session.snap'
+    _the_snake.create_game(snapshot=str(path))
+    _the_snake._save_session(played, snapshot=str(path))
+    resumed = _the_snake.create_game(snapshot=str(path))
+    assert list(resumed.body) == list(played.body)
+    assert resumed.pop_changes(), 'Продолжение должно перерисовать поле.'
+    with pytest.raises(ValueError):
+        _the_snake.create_game(level=1, snapshot=str(path))
+
+
+def test_free_cell_order_is_compressed_on_large_board():
+    game = GameState(500, 500, rng=Random(2))
+    for _ in range(20):
+        game.place_apple(game.neighbours[game.heading][game.head])
+        game.step()
+    data = dump_game(game)
+    # Камни - 31 КБ по биту на клетку, порядок свободных клеток - единицы
+    # КБ вместо 1 МБ
+    assert len(data) < 31_250 + 2_600 + 8_000, (
+        'Порядок свободных клеток не должен занимать байты на клетку.'
+    )
+    restored = load_game(data)
+    assert restored.free_cells == game.free_cells
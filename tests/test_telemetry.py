@@ -0,0 +1,31 @@
+import io
+import json
+
+from snake_telemetry import MEAL, MOVE, TelemetryChannel
+
+
+def test_channel_writes_all_events_in_order():
+    stream = io.StringIO()
+    channel = TelemetryChannel(stream, capacity=8, buffers=64)
+    for tick in range(100):
+        channel.emit(tick, MOVE, tick % 5, 1, 3)
+    channel.emit(100, MEAL, 2, 2, 4)
+    channel.close()
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['tick'] for record in records] == list(range(101))
+    assert records[0] == {
+        'tick': 0, 'event': 'move', 'x': 0, 'y': 1, 'value': 3
+    }
+    assert records[-1]['event'] == 'meal'
+    assert channel.dropped == 0
+
+
+def test_snake_move_reports_to_channel(_the_snake):
+    stream = io.StringIO()
+    channel = TelemetryChannel(stream)
+    snake = _the_snake.Snake(telemetry=channel)
+    for _ in range(3):
+        snake.move()
+    channel.close()
+    events = [json.loads(line)['event'] for line in stream.getvalue().splitlines()]
+    assert events.count('move') == 3
@@ -0,0 +1,25 @@
+import pytest
+
+from snake_varint import read_varint, write_varint
+
+
+def test_varint_round_trip():
+    out = bytearray()
+    values = [0, 1, 127, 128, 300, 1 << 35]
+    for value in values:
+        write_varint(out, value)
+    assert len(out) == 1 + 1 + 1 + 2 + 2 + 6, (
+        'Число занимает по байту на каждые 7 бит.'
+    )
+    offset = 0
+    for value in values:
+        decoded, offset = read_varint(out, offset)
+        assert decoded == value
+    assert offset == len(out)
+
+
+def test_truncated_varint_raises_given_error():
+    with pytest.raises(ValueError):
+        read_varint(b'\x80\x80', 0)
+    with pytest.raises(EOFError):
+        read_varint(b'\x80', 0, EOFError)
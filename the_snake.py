@@ -1,6 +1,24 @@
-"""Импортируем модули для визуализации игры, нахождения случайного значения."""
+"""Импортируем модули для визуализации игры и игровую логику."""
+import argparse
+import os
+from collections import OrderedDict, deque
+from functools import lru_cache, partial
+from random import getrandbits
+
 import pygame
-from random import choice, randint
+
+from snake_autopilot import AUTOPILOTS
+from snake_engine import (  # noqa: F401
+    ATE, DOWN, HIT_ROCK, HIT_SELF, LEFT, RIGHT, SPEED, STEPS, UP, GameState
+)
+from snake_levels import generate_level
+from snake_metrics import (
+    DISPLAY, DRAW, IDLE, INPUT, LOGIC, FrameTimer, NullTimer, profile_switch
+)
+from snake_replay import RecordedGame, Replay
+from snake_telemetry import (
+    MEAL, MOVE, NULL_CHANNEL, RESET_ROCK, RESET_SELF, ROCK, TelemetryChannel
+)
 
 
 # Константы для размеров поля и сетки:
@@ -9,15 +27,6 @@ GRID_SIZE = 20
 GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = SCREEN_HEIGHT // GRID_SIZE
 
-# Направления движения:
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
-
-# Варианты движения
-STEPS = [UP, DOWN, LEFT, RIGHT]
-
 # Цвет фона - черный:
 BOARD_BACKGROUND_COLOR = (0, 0, 0)
 
@@ -30,181 +39,363 @@ APPLE_COLOR = (255, 0, 0)
 # Цвет змейки
 SNAKE_COLOR = (0, 255, 0)
 
-# Скорость движения змейки:
-SPEED = 10
+# Частота перерисовки экрана, кадров в секунду:
+FPS = 60
+
+# Сколько тиков можно догнать за кадр, прежде чем отбросить отставание:
+MAX_TICKS_PER_FRAME = 5
+
+# Сколько поворотов можно нажать заранее:
+TURN_QUEUE_SIZE = 3
+
+# Клавиша, включающая и сохраняющая профиль cProfile:
+PROFILE_KEY = pygame.K_F9
+
+# Раз во сколько кадров обновляются цифры на панели замеров:
+OVERLAY_REFRESH = 30
+
+# Цвет текста панели замеров:
+OVERLAY_COLOR = (255, 255, 255)
+
+# Цвет камней
+ROCK_COLOR = (78, 87, 84)
 
-# Настройка игрового окна:
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+# Цвет чужих змеек в сетевой игре
+OTHER_SNAKE_COLOR = (255, 200, 0)
 
-# Заголовок окна игрового поля:
-pygame.display.set_caption('Змейка')
+# Цвета змеек арены: по номеру змейки по кругу
+ARENA_COLORS = (
+    SNAKE_COLOR, OTHER_SNAKE_COLOR, (0, 160, 255), (255, 0, 255),
+    (255, 255, 255), (0, 255, 180),
+)
+
+# Сколько змеек и яблок на арене по умолчанию:
+ARENA_SNAKES = 12
+ARENA_APPLES = 8
+
+# Сторона куска фона большого поля в клетках:
+CHUNK_CELLS = 16
+
+# Сколько кусков фона хранится в кэше: с запасом на окно и его края.
+MAX_CHUNKS = 16
+
+# Ближе скольких клеток к краю окна голова сдвигает камеру:
+CAMERA_MARGIN = 4
+
+# Поверхность для отрисовки: до вызова init_display() окна нет,
+# поэтому импорт модуля не требует дисплея.
+screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
 
 # Настройка времени:
 clock = pygame.time.Clock()
 
+# Области экрана, изменившиеся за текущий кадр:
+dirty_rects = []
+
+# Заранее отрисованные клетки: ключ - цвет заливки, рамки и размер клетки.
+_tile_cache = {}
+
+
+def get_tile(color, border=True):
+    """Функция возвращающая готовую поверхность клетки из кэша."""
+    key = (color, BORDER_COLOR if border else None, GRID_SIZE)
+    tile = _tile_cache.get(key)
+    if tile is None:
+        tile = pygame.Surface((GRID_SIZE, GRID_SIZE))
+        tile.fill(color)
+        if border:
+            pygame.draw.rect(tile, BORDER_COLOR, tile.get_rect(), 1)
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        _tile_cache[key] = tile
+    return tile
+
+
+def init_display():
+    """Функция создающая игровое окно и возвращающая его поверхность."""
+    global screen
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+    # Заголовок окна игрового поля:
+    pygame.display.set_caption('Змейка')
+    # Клетки, созданные до окна, пересоздадутся в формате экрана
+    _tile_cache.clear()
+    return screen
+
+
+def to_pixels(cell, width=GRID_WIDTH):
+    """Функция переводящая клетку поля шириной width в точку на экране."""
+    y, x = divmod(cell, width)
+    return (x * GRID_SIZE, y * GRID_SIZE)
+
+
+@lru_cache(maxsize=4)
+def pixel_table(width=GRID_WIDTH, height=GRID_HEIGHT):
+    """Функция возвращающая точки экрана всех клеток поля, что влезает в окно.
+
+    Большие поля рисуются через камеру, для них таблица не строится.
+    """
+    return [(x * GRID_SIZE, y * GRID_SIZE)
+            for y in range(height) for x in range(width)]
+
+
+def draw_cells(surface, cells, color, border=True, points=None):
+    """Функция отрисовывающая клетки одним вызовом blits.
+
+    points - таблица точек клеток из pixel_table, по умолчанию для окна.
+    """
+    tile = get_tile(color, border)
+    points = points or pixel_table()
+    dirty_rects.extend(
+        surface.blits([(tile, points[cell]) for cell in cells])
+    )
+
+
+def draw_cell(surface, cell, color, width=GRID_WIDTH):
+    """Функция отрисовывающая клетку и запоминающая её область."""
+    dirty_rects.append(surface.blit(get_tile(color), to_pixels(cell, width)))
+
+
+def erase_cells(surface, cells, points=None):
+    """Функция затирающая клетки цветом фона."""
+    draw_cells(surface, cells, BOARD_BACKGROUND_COLOR, False, points)
+
+
+def draw_by_color(surface, cells, color_of, points=None):
+    """Функция отрисовывающая клетки по одному blits на цвет.
+
+    color_of(cell) возвращает цвет клетки или None для пустой.
+    """
+    groups = {}
+    for cell in cells:
+        groups.setdefault(color_of(cell), []).append(cell)
+    for color, group in groups.items():
+        if color is None:
+            erase_cells(surface, group, points)
+        else:
+            draw_cells(surface, group, color, points=points)
+
 
 # Тут опишите все классы игры.
 class GameObject:
     """Родительский класс игры."""
 
-    def __init__(self):
+    def __init__(self, game=None):
         """Объявление атрибутов позции и цвета."""
-        self.position = (SCREEN_WIDTH // 2), (SCREEN_HEIGHT // 2)
+        if game is None:
+            game = GameState(GRID_WIDTH, GRID_HEIGHT)
+        self.game = game
         self.body_color = None
 
-    def draw(self):
+    @property
+    def position(self):
+        """Клетка объекта: по умолчанию центр поля."""
+        return self.game.cell(self.game.width // 2, self.game.height // 2)
+
+    def draw(self, surface, cells=None):
         """Пустой метод draw."""
         pass
 
 
 class Rock(GameObject):
-    """Дочерний класс для объекта игры."""
+    """Отображение камней на игровом поле.
+
+    Камни заранее нарисованы на фоне поля кусками BackgroundChunks,
+    которые дорисовываются при появлении камня и перерисовываются после
+    сброса. Выводится только часть поля, что помещается в окно.
+    """
 
-    def __init__(self):
+    def __init__(self, game=None):
         """Определение атрибутов дочернего класса."""
-        self.body_color = (78, 87, 84)
-        self.positions = []
+        super().__init__(game)
+        self.body_color = ROCK_COLOR
+        self.layer = BackgroundChunks(self.game)
+        # Неподвижное окно в левом верхнем углу поля
+        self.camera = Camera(self.game.width, self.game.height)
+
+    @property
+    def positions(self):
+        """Клетки, занятые камнями."""
+        return self.game.rocks
+
+    def draw(self, surface, cells=None):
+        """Метод выводящий слой камней: целиком или изменившиеся клетки.
+
+        Полный вывод кладёт на экран весь фон окна вместе с камнями.
+        """
+        layer = self.layer
+        if cells is None:
+            layer.sync()
+            layer.draw(surface, self.camera)
+            dirty_rects.append(pygame.Rect(
+                0, 0, self.camera.width * GRID_SIZE,
+                self.camera.height * GRID_SIZE
+            ))
+            return
+        layer.sync(cells)
+        rocks = self.game.rocks
+        points = pixel_table(self.game.width, self.game.height)
+        dirty_rects.extend(
+            layer.draw_cell(surface, cell, points[cell])
+            for cell in cells if cell in rocks
+        )
 
-    def draw(self):
-        """Метод отрисовывающий объект."""
-        for position in self.positions:
-            rect = (pygame.Rect(position, (GRID_SIZE, GRID_SIZE)))
-            pygame.draw.rect(screen, self.body_color, rect)
-            pygame.draw.rect(screen, BORDER_COLOR, rect, 1)
-
-            # Отрисовка головы змейки
-            head_rect = pygame.Rect(self.positions[0], (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(screen, self.body_color, head_rect)
-            pygame.draw.rect(screen, BORDER_COLOR, head_rect, 1)
-    
     def randomize_position(self):
         """Метод генерирующий случайные координаты на игровом поле."""
-        return ((randint(0, GRID_WIDTH - 1) * GRID_SIZE),
-                (randint(0, GRID_HEIGHT - 1) * GRID_SIZE))
+        return self.game.random_free_cell()
 
 
 class Apple(GameObject):
-    """Дочерний класс для объекта игры."""
+    """Отображение яблока на игровом поле."""
 
     body_color = (255, 0, 0)
 
-    def __init__(self):
+    def __init__(self, game=None):
         """Переопределение атрибутов из родительского класса."""
-        super().__init__()
+        super().__init__(game)
         self.body_color = APPLE_COLOR
-        self.position = self.randomize_position()
+
+    @property
+    def position(self):
+        """Клетка, в которой лежит яблоко."""
+        return self.game.apple
 
     def randomize_position(self):
         """Метод генерирующий случайные координаты на игровом поле."""
-        return ((randint(0, GRID_WIDTH - 1) * GRID_SIZE),
-                (randint(0, GRID_HEIGHT - 1) * GRID_SIZE))
+        return self.game.random_free_cell()
 
-    def draw(self):
+    def draw(self, surface, cells=None):
         """Метод отрисовывающий объект."""
-        rect = pygame.Rect(self.position, (GRID_SIZE, GRID_SIZE))
-        pygame.draw.rect(screen, self.body_color, rect)
-        pygame.draw.rect(screen, BORDER_COLOR, rect, 1)
+        if self.position is not None:
+            draw_cell(surface, self.position, self.body_color,
+                      self.game.width)
 
 
 class Snake(GameObject):
-    """Дочерний класс для объекта игры."""
+    """Отображение змейки и управление ею."""
 
-    def __init__(self):
+    def __init__(self, game=None, telemetry=NULL_CHANNEL, autopilot=None):
         """Переропределение атрибутов родительского класса и создание новых."""
-        super().__init__()
-        self.positions = [((GRID_WIDTH // 2 - 1) * GRID_SIZE,
-                           (GRID_HEIGHT // 2 - 1) * GRID_SIZE)]
-        self.length = 1
-        self.direction = RIGHT
+        super().__init__(game)
+        self.telemetry = telemetry
+        # Автопилот из snake_autopilot; None - змейкой управляет игрок
+        self.autopilot = autopilot
         self.next_direction = None
-        self.body_color = (0, 255, 0)
-        self.last = None
+        # Нажатые, но ещё не применённые повороты: по одному за тик
+        self.turns = deque(maxlen=TURN_QUEUE_SIZE)
+        self.body_color = SNAKE_COLOR
 
-    def update_direction(self):
-        """Метод обновления позициюи объекта."""
-        if self.next_direction:
-            self.direction = self.next_direction
-            self.next_direction = None
-
-    # обновляет позицию змейки (координаты каждой секции)
-    # добавляя новую голову в начало списка positions
-    # и удаляя последний элемент, если длина змейки не увеличилась.
-    def move(self):
-        print(self.next_direction)
-        """Метод способствующий передвежению объекта по игровому полю."""
-        if self.next_direction == RIGHT:
-            if self.positions[0][0] + GRID_SIZE > SCREEN_WIDTH - GRID_SIZE:
-                result = (abs(self.positions[0][0] + GRID_SIZE
-                              - SCREEN_WIDTH), self.positions[0][1])
-            else:
-                result = (self.positions[0][0] + GRID_SIZE,
-                          self.positions[0][1])
-        elif self.next_direction == LEFT:
-            if self.positions[0][0] - GRID_SIZE == -GRID_SIZE:
-                result = (abs(self.positions[0][0] - GRID_SIZE
-                          + SCREEN_WIDTH), self.positions[0][1])
-            else:
-                result = (self.positions[0][0] - GRID_SIZE,
-                          self.positions[0][1])
-        elif self.next_direction == UP:
-            if self.positions[0][1] - GRID_SIZE == -GRID_SIZE:
-                result = (self.positions[0][0],
-                          abs(self.positions[0][1]
-                              - GRID_SIZE + SCREEN_HEIGHT))
-            else:
-                result = (self.positions[0][0], self.positions[0][1]
-                          - GRID_SIZE)
-        elif self.next_direction == DOWN:
-            if self.positions[0][1] + GRID_SIZE > SCREEN_HEIGHT - GRID_SIZE:
-                result = (self.positions[0][0], abs(self.positions[0][1]
-                          + GRID_SIZE - SCREEN_HEIGHT))
-            else:
-                result = (self.positions[0][0],
-                          self.positions[0][1] + GRID_SIZE)
-        self.positions.insert(0, result)
-        self.positions.pop()
+    @property
+    def position(self):
+        """Клетка головы змейки."""
+        return self.game.head
 
-    def draw(self):
-        """Метод отрисовывающий объект."""
-        for position in self.positions:
-            rect = (pygame.Rect(position, (GRID_SIZE, GRID_SIZE)))
-            pygame.draw.rect(screen, self.body_color, rect)
-            pygame.draw.rect(screen, BORDER_COLOR, rect, 1)
+    @property
+    def positions(self):
+        """Сегменты змейки от головы к хвосту."""
+        return self.game.body
 
-            # Отрисовка головы змейки
-            head_rect = pygame.Rect(self.positions[0], (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(screen, self.body_color, head_rect)
-            pygame.draw.rect(screen, BORDER_COLOR, head_rect, 1)
+    @property
+    def direction(self):
+        """Текущее направление движения."""
+        return self.game.direction
 
-            # Затирание последнего сегмента
-            if self.last:
-                last_rect = pygame.Rect(self.last, (GRID_SIZE, GRID_SIZE))
-                pygame.draw.rect(screen, BOARD_BACKGROUND_COLOR, last_rect)
+    @property
+    def length(self):
+        """Длина змейки."""
+        return self.game.length
 
     @property
     def get_head_position(self):
         """Метод возвращающий голову объекта."""
-        head = self.positions[0]
-        return head
+        return self.game.head
+
+    def queue_turn(self, direction):
+        """Метод запоминающий поворот до следующего свободного тика."""
+        last = self.turns[-1] if self.turns else self.direction
+        if direction == last or direction == (-last[0], -last[1]):
+            return
+        if len(self.turns) < self.turns.maxlen:
+            self.turns.append(direction)
+
+    def update_direction(self):
+        """Метод берущий из очереди поворот для ближайшего тика."""
+        if self.autopilot is not None:
+            self.next_direction = self.autopilot.choose(self.game)
+        elif self.next_direction is None and self.turns:
+            self.next_direction = self.turns.popleft()
+
+    def move(self):
+        """Метод выполняющий один ход игры и возвращающий его событие."""
+        self.update_direction()
+        length = self.game.length
+        event = self.game.step(self.next_direction)
+        self.next_direction = None
+        if self.telemetry.enabled:
+            self.report(event, length)
+        return event
+
+    def report(self, event, length):
+        """Метод отправляющий события хода в канал телеметрии."""
+        game = self.game
+        emit = self.telemetry.emit
+        if event == HIT_SELF:
+            emit(game.ticks, RESET_SELF, value=length)
+            return
+        if event == HIT_ROCK:
+            emit(game.ticks, RESET_ROCK, value=length)
+            return
+        x, y = game.xy(game.head)
+        emit(game.ticks, MOVE, x, y, len(game.body))
+        if event == ATE:
+            emit(game.ticks, MEAL, x, y, game.length)
+            if game.new_rock is not None:
+                emit(game.ticks, ROCK, *game.xy(game.new_rock))
+
+    def draw(self, surface, cells=None):
+        """Метод отрисовывающий сегменты среди изменившихся клеток."""
+        body = self.game.body
+        if cells is not None:
+            occupied = self.game.occupied
+            body = [cell for cell in cells if occupied[cell]]
+        draw_cells(surface, body, self.body_color,
+                   points=pixel_table(self.game.width, self.game.height))
 
     def reset(self):
         """Метод возвращающий объект в исходное состояние."""
-        self.clear()
-        self.length = 1
-        self.positions = [((GRID_WIDTH // 2 - 1) * GRID_SIZE,
-                           (GRID_HEIGHT // 2 - 1) * GRID_SIZE)]
-        self.direction = choice(STEPS)
-        self.next_direction = RIGHT
+        self.game.reset()
+
+
+class FixedTimestep:
+    """Планировщик логических тиков с постоянным шагом.
 
-    def clear(self):
-        """Метод очищающий поле во время столкновение объекта с самим собой."""
-        for i in range(len(self.positions)):
-            rect = pygame.Rect(self.positions[i], (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(screen, BOARD_BACKGROUND_COLOR, rect)
+    Время кадра копится в аккумуляторе и расходуется целыми тиками, поэтому
+    скорость игры не зависит от частоты перерисовки.
+    """
 
-        for i in range(len(Rock().positions)):
-            rect = pygame.Rect(Rock().positions[i], (GRID_SIZE, GRID_SIZE))
-            pygame.draw.rect(screen, BOARD_BACKGROUND_COLOR, rect)
+    def __init__(self, rate=SPEED, max_ticks=MAX_TICKS_PER_FRAME):
+        """Задание длины тика в миллисекундах и предела догоняющих тиков."""
+        self.step = 1000 / rate
+        self.max_ticks = max_ticks
+        self.accumulator = 0.0
+        self.dropped = 0
+
+    def advance(self, elapsed):
+        """Метод возвращающий, сколько тиков выполнить за elapsed мс."""
+        self.accumulator += elapsed
+        ticks = int(self.accumulator // self.step)
+        if ticks > self.max_ticks:
+            # Слишком сильно отстали: догоняем частично, остальное отбрасываем
+            self.dropped += ticks - self.max_ticks
+            ticks = self.max_ticks
+            self.accumulator %= self.step
+        else:
+            self.accumulator -= ticks * self.step
+        return ticks
+
+    @property
+    def alpha(self):
+        """Доля следующего тика, уже прошедшая: для интерполяции кадра."""
+        return self.accumulator / self.step
 
 
 def handle_keys(game_object):
@@ -214,68 +405,629 @@ def handle_keys(game_object):
             pygame.quit()
             raise SystemExit
         elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP and game_object.direction != DOWN:
-                game_object.next_direction = UP
-            elif event.key == pygame.K_DOWN and game_object.direction != UP:
-                game_object.next_direction = DOWN
-            elif event.key == pygame.K_LEFT and game_object.direction != RIGHT:
-                game_object.next_direction = LEFT
-            elif event.key == pygame.K_RIGHT and game_object.direction != LEFT:
-                game_object.next_direction = RIGHT
-            game_object.last = game_object.positions[-1]
-            game_object.move()
-            game_object.update_direction()
-            screen.fill(BOARD_BACKGROUND_COLOR)
-
-
-def main():
-    """Основная функция игры."""
+            if event.key == pygame.K_UP:
+                game_object.queue_turn(UP)
+            elif event.key == pygame.K_DOWN:
+                game_object.queue_turn(DOWN)
+            elif event.key == pygame.K_LEFT:
+                game_object.queue_turn(LEFT)
+            elif event.key == pygame.K_RIGHT:
+                game_object.queue_turn(RIGHT)
+            elif event.key == PROFILE_KEY:
+                profile_switch.toggle()
+
+
+class StatsOverlay:
+    """Панель с FPS и перцентилями фаз кадра поверх игрового поля."""
+
+    def __init__(self, timer, refresh=OVERLAY_REFRESH):
+        """Запоминание таймера и частоты обновления текста."""
+        self.timer = timer
+        self.refresh = refresh
+        self.frames = 0
+        self.font = None
+        self.image = None
+
+    def render(self):
+        """Метод рисующий панель: FPS и p50/p99 каждой фазы в мс."""
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        lines = [f'FPS {self.timer.fps:.0f}']
+        for name, values in self.timer.summary().items():
+            lines.append(f'{name} {values["p50"]:.2f}/{values["p99"]:.2f}')
+        images = [self.font.render(line, True, OVERLAY_COLOR)
+                  for line in lines]
+        height = sum(image.get_height() for image in images)
+        width = max(image.get_width() for image in images)
+        if self.image is not None:
+            # Панель не сжимается, чтобы не оставлять следов старого текста
+            width = max(width, self.image.get_width())
+        self.image = pygame.Surface((width, height))
+        self.image.fill(BOARD_BACKGROUND_COLOR)
+        top = 0
+        for image in images:
+            self.image.blit(image, (0, top))
+            top += image.get_height()
+
+    def draw(self, surface, cells=None):
+        """Метод выводящий панель в левый верхний угол."""
+        if self.image is None or self.frames % self.refresh == 0:
+            self.render()
+        self.frames += 1
+        dirty_rects.append(surface.blit(self.image, (0, 0)))
+
+
+def draw_frame(surface, game, *objects):
+    """Функция перерисовывающая клетки, изменившиеся с прошлого кадра."""
+    cells = game.pop_changes()
+    erase_cells(surface, cells, pixel_table(game.width, game.height))
+    for game_object in objects:
+        game_object.draw(surface, cells)
+
+
+def _spans(start, count, board, chunk):
+    """Отрезки окна (клетка поля, клетка окна, длина) внутри одного куска."""
+    spans = []
+    view = 0
+    cell = start
+    while view < count:
+        length = min(count - view, chunk - cell % chunk, board - cell)
+        spans.append((cell, view, length))
+        view += length
+        cell = (cell + length) % board
+    return spans
+
+
+class Camera:
+    """Окно размером с экран на большом поле, следующее за головой.
+
+    Поле замкнуто, поэтому окно тоже переходит через край. Камера
+    сдвигается, только когда голова подходит к краю окна ближе margin
+    клеток, и тогда ставит голову в центр.
+    """
+
+    def __init__(self, board_width, board_height, width=GRID_WIDTH,
+                 height=GRID_HEIGHT, margin=CAMERA_MARGIN):
+        """Окно width x height клеток в левом верхнем углу поля."""
+        self.board_width = board_width
+        self.board_height = board_height
+        self.width = min(width, board_width)
+        self.height = min(height, board_height)
+        self.margin = margin
+        self.x = 0
+        self.y = 0
+
+    def follow(self, cell):
+        """Метод сдвигающий окно к клетке cell; True, если оно сдвинулось."""
+        cell_y, cell_x = divmod(cell, self.board_width)
+        x = self._recenter(cell_x, self.x, self.width, self.board_width)
+        y = self._recenter(cell_y, self.y, self.height, self.board_height)
+        moved = (x, y) != (self.x, self.y)
+        self.x, self.y = x, y
+        return moved
+
+    def _recenter(self, cell, origin, size, board):
+        if size == board:
+            return 0
+        offset = (cell - origin) % board
+        if self.margin <= offset < size - self.margin:
+            return origin
+        return (cell - size // 2) % board
+
+    def to_view(self, cell):
+        """Метод возвращающий точку экрана для клетки поля вне окна - None."""
+        cell_y, cell_x = divmod(cell, self.board_width)
+        x = (cell_x - self.x) % self.board_width
+        y = (cell_y - self.y) % self.board_height
+        if x < self.width and y < self.height:
+            return x * GRID_SIZE, y * GRID_SIZE
+        return None
+
+    def spans(self, chunk):
+        """Метод разбивающий окно на прямоугольники внутри кусков фона."""
+        columns = _spans(self.x, self.width, self.board_width, chunk)
+        rows = _spans(self.y, self.height, self.board_height, chunk)
+        return [(column, row) for row in rows for column in columns]
+
+    def cells(self):
+        """Метод перечисляющий пары (клетка поля, точка экрана) окна."""
+        # Кусок размером с поле: окно делится только на краю поля
+        for column, row in self.spans(max(self.board_width,
+                                          self.board_height)):
+            x, view_x, width = column
+            y, view_y, height = row
+            for dy in range(height):
+                row_start = (y + dy) * self.board_width + x
+                top = (view_y + dy) * GRID_SIZE
+                for dx in range(width):
+                    yield row_start + dx, ((view_x + dx) * GRID_SIZE, top)
+
+
+@lru_cache(maxsize=4)
+def window_points(width, height):
+    """Функция возвращающая точки экрана клеток поля, видимых в окне.
+
+    Поле больше окна видно от левого верхнего угла: в словаре только
+    клетки окна, поэтому его размер не зависит от размера поля.
+    """
+    return dict(Camera(width, height).cells())
+
+
+class BackgroundChunks:
+    """Фон большого поля с камнями, нарисованный кусками по запросу.
+
+    Кусок рисуется при первом показе и хранится в кэше на limit кусков,
+    откуда вытесняется самый давний. Новый камень дорисовывается в свой
+    кусок, поэтому камни не рисуются заново каждый кадр.
+    """
+
+    def __init__(self, game, size=CHUNK_CELLS, limit=MAX_CHUNKS):
+        """Пустой кэш кусков для партии game."""
+        self.game = game
+        self.size = size
+        self.limit = limit
+        self.chunks = OrderedDict()
+        # Слой камней, с которого нарисованы куски, и число камней в нём
+        self._rocks = game.rocks
+        self._rock_count = len(game.rocks)
+
+    def chunk(self, x, y):
+        """Метод возвращающий поверхность куска, содержащего клетку (x, y)."""
+        key = (x // self.size, y // self.size)
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self._render(*key)
+            self.chunks[key] = surface
+            if len(self.chunks) > self.limit:
+                self.chunks.popitem(last=False)
+        else:
+            self.chunks.move_to_end(key)
+        return surface
+
+    def sync(self, cells=None):
+        """Метод переносящий в куски камни, появившиеся среди cells.
+
+        Сброс партии заменяет слой камней, тогда кэш очищается и метод
+        возвращает True: фон нужно перерисовать целиком. Без cells новые
+        камни видны только по их числу.
+        """
+        rocks = self.game.rocks
+        count = len(rocks)
+        if rocks is not self._rocks or (cells is None
+                                        and count != self._rock_count):
+            self._rocks = rocks
+            self._rock_count = count
+            self.chunks.clear()
+            return True
+        self._rock_count = count
+        tile = get_tile(ROCK_COLOR)
+        for cell in cells or ():
+            if cell in rocks:
+                y, x = divmod(cell, self.game.width)
+                chunk = self.chunks.get((x // self.size, y // self.size))
+                if chunk is not None:
+                    chunk.blit(tile, ((x % self.size) * GRID_SIZE,
+                                      (y % self.size) * GRID_SIZE))
+        return False
+
+    def draw(self, surface, camera):
+        """Метод заливающий всё окно камеры фоном из кусков."""
+        for (x, view_x, width), (y, view_y, height) in camera.spans(
+                self.size):
+            area = pygame.Rect((x % self.size) * GRID_SIZE,
+                               (y % self.size) * GRID_SIZE,
+                               width * GRID_SIZE, height * GRID_SIZE)
+            surface.blit(self.chunk(x, y),
+                         (view_x * GRID_SIZE, view_y * GRID_SIZE), area)
+
+    def draw_cell(self, surface, cell, point):
+        """Метод восстанавливающий фон клетки в точке point экрана."""
+        y, x = divmod(cell, self.game.width)
+        area = pygame.Rect((x % self.size) * GRID_SIZE,
+                           (y % self.size) * GRID_SIZE, GRID_SIZE, GRID_SIZE)
+        return surface.blit(self.chunk(x, y), point, area)
+
+    def _render(self, chunk_x, chunk_y):
+        left, top = chunk_x * self.size, chunk_y * self.size
+        width = min(self.size, self.game.width - left)
+        height = min(self.size, self.game.height - top)
+        surface = pygame.Surface((width * GRID_SIZE, height * GRID_SIZE))
+        surface.fill(BOARD_BACKGROUND_COLOR)
+        rocks = self.game.rocks
+        tile = get_tile(ROCK_COLOR)
+        board_width = self.game.width
+        surface.blits([
+            (tile, (x * GRID_SIZE, y * GRID_SIZE))
+            for y in range(height) for x in range(width)
+            if (top + y) * board_width + left + x in rocks
+        ])
+        return surface
+
+
+class BoardView:
+    """Отрисовка большого поля через камеру: рисуется только окно.
+
+    Время кадра и память зависят от размера окна, а не поля: фон с камнями
+    берётся из кусков, а змейка и яблоко ищутся среди клеток окна.
+    """
+
+    def __init__(self, game, snake, apple, camera=None, background=None):
+        """Запоминание объектов, камеры и кэша фона."""
+        self.game = game
+        self.snake = snake
+        self.apple = apple
+        self.camera = camera or Camera(game.width, game.height)
+        self.background = background or BackgroundChunks(game)
+        self.redraw = True
+
+    @staticmethod
+    def needed(game):
+        """Метод проверяющий, что поле партии не помещается в окно."""
+        return game.width > GRID_WIDTH or game.height > GRID_HEIGHT
+
+    def draw_frame(self, surface, *overlays):
+        """Метод перерисовывающий окно целиком или только изменения."""
+        game = self.game
+        cells = game.pop_changes()
+        if self.background.sync(cells):
+            self.redraw = True
+        if self.camera.follow(game.head):
+            self.redraw = True
+        if self.redraw:
+            self.redraw = False
+            self.background.draw(surface, self.camera)
+            self._draw_objects(surface, self.camera.cells())
+            dirty_rects.append(surface.get_rect())
+        else:
+            visible = []
+            for cell in cells:
+                point = self.camera.to_view(cell)
+                if point is not None:
+                    visible.append((cell, point))
+                    dirty_rects.append(
+                        self.background.draw_cell(surface, cell, point)
+                    )
+            self._draw_objects(surface, visible)
+        for overlay in overlays:
+            overlay.draw(surface)
+
+    def _draw_objects(self, surface, cells):
+        occupied = self.game.occupied
+        apple = self.game.apple
+        body = []
+        fruit = []
+        for cell, point in cells:
+            if occupied[cell]:
+                body.append(point)
+            elif cell == apple:
+                fruit.append(point)
+        tile = get_tile(self.snake.body_color)
+        surface.blits([(tile, position) for position in body])
+        tile = get_tile(self.apple.body_color)
+        surface.blits([(tile, position) for position in fruit])
+
+
+def create_game(board=None, record=None, level=None, snapshot=None):
+    """Функция создающая партию на поле board, с записью, если задан record.
+
+    level - зерно уровня из snake_levels; запись партий на уровнях
+    не поддерживается, так как файл записи не хранит уровень. snapshot -
+    архив снимков: если в нём есть снимки, партия продолжается с последнего.
+    """
+    if snapshot is not None and os.path.exists(snapshot):
+        if record is not None or level is not None:
+            raise ValueError('Продолжение партии задаёт поле само')
+        from snake_snapshot import SnapshotArchive
+        with SnapshotArchive(snapshot) as archive:
+            if len(archive):
+                return archive.restore(track_changes=True)
+    width, height = board or (GRID_WIDTH, GRID_HEIGHT)
+    if record is None:
+        return GameState(width, height, track_changes=True, level=(
+            None if level is None else generate_level(width, height, level)
+        ))
+    if level is not None:
+        raise ValueError('Запись партии на уровне не поддерживается')
+    return RecordedGame(getrandbits(32), width, height, track_changes=True)
+
+
+def _save_session(game, record=None, snapshot=None):
+    """Запись партии и снимок для продолжения, если они заданы."""
+    if record is not None:
+        game.to_replay().save(record)
+    if snapshot is not None:
+        from snake_snapshot import save_game
+        save_game(snapshot, game)
+
+
+def main(record=None, profile=False, telemetry=None, autopilot=None,
+         board=None, level=None, snapshot=None):
+    """Основная функция игры.
+
+    record - путь для сохранения записи партии, profile - включить замеры
+    фаз кадра с панелью на экране, сводкой p50/p99 в snake_frames.json
+    при выходе и профиль cProfile по сигналу SIGUSR1,
+    telemetry - файл для журнала игровых событий в формате JSON Lines,
+    autopilot - имя автопилота из AUTOPILOTS для игры без игрока,
+    board - размеры поля в клетках (ширина, высота); поле больше окна
+    показывается через камеру, следующую за головой, level - зерно уровня
+    с постоянными камнями, snapshot - архив снимков: партия продолжается
+    с последнего снимка, а при выходе в архив дописывается новый.
+    """
     # Инициализация PyGame:
     pygame.init()
-    # Тут нужно создать экземпляры классов.
-    apple = Apple()
-    snake = Snake()
-    rock = Rock()
-    running = True
-    while running:
-
+    surface = init_display()
+    # Игровая логика живёт в GameState, объекты ниже только её отображают.
+    game = create_game(board, record, level, snapshot)
+    channel = NULL_CHANNEL
+    if telemetry is not None:
+        channel = TelemetryChannel.to_file(telemetry)
+    apple = Apple(game)
+    pilot = None if autopilot is None else AUTOPILOTS[autopilot]()
+    snake = Snake(game, channel, pilot)
+    rock = Rock(game)
+    scheduler = FixedTimestep()
+    timer = NullTimer()
+    overlays = []
+    if profile:
+        timer = FrameTimer()
+        overlays.append(StatsOverlay(timer))
+        profile_switch.install_signal()
+    if BoardView.needed(game):
+        # Поле больше окна: клетки рисует камера, она же выводит панели
+        draw = partial(BoardView(game, snake, apple).draw_frame, surface,
+                       *overlays)
+    else:
+        draw = partial(draw_frame, surface, game, rock, snake, apple,
+                       *overlays)
+    elapsed = 0
+    while True:
+        timer.start()
         try:
             handle_keys(snake)
         except SystemExit:
-            running = False
-        if apple.position in snake.positions:
-            apple.randomize_position()
-        count = 0
-        for i in range(len(snake.positions)):
-            if snake.positions[i] == snake.get_head_position:
-                count += 1
-        if count == 2:
-            print(True)
-            screen.fill(BOARD_BACKGROUND_COLOR)
-            snake.reset()
-            rock.positions = []
-        if snake.positions[0] == apple.position:
-            if (len(snake.positions) + 1) % 4 == 0:
-                rock.positions.append(rock.randomize_position())
-            snake.length += 1
-            snake.positions.append(snake.last)
-            snake.last = None
-            apple.__init__()
-        snake.next_direction = snake.direction
-        snake.last = snake.positions[-1]
-        if snake.positions[0] in rock.positions:
-            screen.fill(BOARD_BACKGROUND_COLOR)
-            snake.reset()
-            rock.positions = []
-        snake.move()
-        snake.draw()
-        apple.draw()
-        rock.draw()
-        clock.tick(SPEED)
-        pygame.display.update()
-        pygame.display.flip()
+            break
+        timer.mark(INPUT)
+        for _ in range(scheduler.advance(elapsed)):
+            snake.move()
+        timer.mark(LOGIC)
+        draw()
+        timer.mark(DRAW)
+        # Обновляем на экране только изменившиеся области
+        pygame.display.update(dirty_rects)
+        dirty_rects.clear()
+        timer.mark(DISPLAY)
+        elapsed = clock.tick(FPS)
+        timer.mark(IDLE)
+        timer.end()
+    if profile:
+        timer.save()
+    _save_session(game, record, snapshot)
+    channel.close()
     pygame.quit()
 
 
+class OnlinePlayer:
+    """Игрок сетевой игры: повороты уходят на сервер, поле приходит с него.
+
+    Свой поворот виден сразу: голова рисуется на шаг вперёд в выбранном
+    направлении, а ответ сервера потом исправляет предсказание.
+    """
+
+    def __init__(self, connection, board=None):
+        """Запоминание неблокирующего сокета и зеркала поля."""
+        from snake_server import READ_SIZE, RemoteBoard
+        self.connection = connection
+        self.board = board or RemoteBoard()
+        self.read_size = READ_SIZE
+        self.predicted = None
+
+    def queue_turn(self, direction):
+        """Метод отправляющий поворот серверу."""
+        message = self.board.turn(direction)
+        if message:
+            try:
+                self.connection.send(message)
+            except ConnectionError:
+                # Отключение сервера заметит receive
+                pass
+
+    def wait_ready(self):
+        """Метод ждущий снимок поля; False - сервер закрыл соединение.
+
+        После снимка сокет становится неблокирующим, чтобы не тормозить
+        кадры.
+        """
+        try:
+            while not self.board.ready:
+                data = self.connection.recv(self.read_size)
+                if not data:
+                    return False
+                self.board.feed(data)
+        except ConnectionError:
+            return False
+        self.connection.setblocking(False)
+        return True
+
+    def receive(self):
+        """Метод применяющий всё, что пришло; False - сервер отключился."""
+        while True:
+            try:
+                data = self.connection.recv(self.read_size)
+            except BlockingIOError:
+                return True
+            except ConnectionError:
+                return False
+            if not data:
+                return False
+            self.board.feed(data)
+
+    def color(self, cell):
+        """Метод возвращающий цвет клетки поля или None для пустой."""
+        board = self.board
+        if board.own[cell] or cell == self.predicted:
+            return SNAKE_COLOR
+        if board.occupied[cell]:
+            return OTHER_SNAKE_COLOR
+        if board.rocks.mask[cell]:
+            return ROCK_COLOR
+        if cell in board.apples:
+            return APPLE_COLOR
+        return None
+
+    def draw(self, surface, cells=None):
+        """Метод перерисовывающий клетки, изменившиеся по сообщениям."""
+        board = self.board
+        if not board.ready:
+            return
+        cells = board.changes
+        board.changes = set()
+        predicted = board.predicted_head()
+        if predicted != self.predicted:
+            cells.update(cell for cell in (self.predicted, predicted)
+                         if cell is not None)
+            self.predicted = predicted
+        points = window_points(board.width, board.height)
+        draw_by_color(surface, [cell for cell in cells if cell in points],
+                      self.color, points)
+
+
+def play_online(host=None, port=None):
+    """Функция игры на сервере snake_server вместе с другими игроками.
+
+    Без host и port подключается к адресу сервера по умолчанию.
+    """
+    import socket
+
+    from snake_server import HOST, PORT
+    pygame.init()
+    surface = init_display()
+    host = HOST if host is None else host
+    port = PORT if port is None else port
+    # Соединение закрывается при любом выходе, и сервер сразу видит уход
+    with socket.create_connection((host, port)) as connection:
+        player = OnlinePlayer(connection)
+        # Первым делом ждём снимок поля; сервер мог закрыть соединение раньше
+        connected = player.wait_ready()
+        while connected:
+            try:
+                handle_keys(player)
+            except SystemExit:
+                break
+            if not player.receive():
+                break
+            player.draw(surface)
+            pygame.display.update(dirty_rects)
+            dirty_rects.clear()
+            clock.tick(FPS)
+    pygame.quit()
+
+
+class ArenaView:
+    """Отрисовка арены: у каждой змейки свой цвет, рисуются изменения."""
+
+    def __init__(self, arena):
+        """Запоминание арены, которая отслеживает изменившиеся клетки."""
+        from snake_arena import FREE
+        self.arena = arena
+        self.free = FREE
+
+    def color(self, cell):
+        """Метод возвращающий цвет клетки арены или None для пустой."""
+        arena = self.arena
+        owner = arena.owner[cell]
+        if owner != self.free:
+            return ARENA_COLORS[owner % len(ARENA_COLORS)]
+        if arena.rocks.mask[cell]:
+            return ROCK_COLOR
+        if cell in arena.apples:
+            return APPLE_COLOR
+        return None
+
+    def draw(self, surface, cells=None):
+        """Метод перерисовывающий клетки, изменившиеся с прошлого кадра."""
+        arena = self.arena
+        points = window_points(arena.width, arena.height)
+        draw_by_color(surface, [cell for cell in arena.pop_changes()
+                                if cell in points], self.color, points)
+
+
+def play_arena(snakes=ARENA_SNAKES, apples=ARENA_APPLES, board=None,
+               speed=SPEED):
+    """Функция показывающая арену змеек под управлением GreedyPilot.
+
+    board - размеры поля в клетках; у поля больше окна видна и
+    перерисовывается только его часть от левого верхнего угла.
+    """
+    from snake_arena import Arena, GreedyPilot
+    pygame.init()
+    surface = init_display()
+    width, height = board or (GRID_WIDTH, GRID_HEIGHT)
+    arena = Arena(width, height, apples=apples, track_changes=True)
+    for _ in range(snakes):
+        arena.add_snake(GreedyPilot())
+    view = ArenaView(arena)
+    scheduler = FixedTimestep(speed)
+    elapsed = 0
+    while not any(event.type == pygame.QUIT for event in pygame.event.get()):
+        for _ in range(scheduler.advance(elapsed)):
+            arena.step()
+        view.draw(surface)
+        pygame.display.update(dirty_rects)
+        dirty_rects.clear()
+        elapsed = clock.tick(FPS)
+    pygame.quit()
+
+
+def play_replay(path, speed=SPEED):
+    """Функция показывающая записанную партию: speed=None - без задержек."""
+    pygame.init()
+    surface = init_display()
+    # Отрисовка появляется на первом тике, когда партия уже создана
+    draw = []
+
+    def show_tick(game, event):
+        if not draw:
+            snake, apple = Snake(game), Apple(game)
+            if BoardView.needed(game):
+                # Запись на большом поле показывается через камеру
+                view = BoardView(game, snake, apple)
+                draw.append(partial(view.draw_frame, surface))
+            else:
+                draw.append(partial(draw_frame, surface, game, Rock(game),
+                                    snake, apple))
+        if pygame.event.peek(pygame.QUIT):
+            raise SystemExit
+        draw[0]()
+        pygame.display.update(dirty_rects)
+        dirty_rects.clear()
+        if speed:
+            clock.tick(speed)
+
+    try:
+        Replay.load(path).play(show_tick, track_changes=True)
+    except SystemExit:
+        pass
+    pygame.quit()
+
+
+def cli(argv=None):
+    """Функция запуска игры с настройками main из командной строки."""
+    parser = argparse.ArgumentParser(description='Игра «Змейка».')
+    parser.add_argument('--autopilot', choices=sorted(AUTOPILOTS))
+    parser.add_argument('--board', type=int, nargs=2,
+                        metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--level', type=int)
+    parser.add_argument('--record')
+    parser.add_argument('--snapshot')
+    parser.add_argument('--telemetry')
+    parser.add_argument('--profile', action='store_true')
+    args = parser.parse_args(argv)
+    board = None if args.board is None else tuple(args.board)
+    main(record=args.record, profile=args.profile, telemetry=args.telemetry,
+         autopilot=args.autopilot, board=board, level=args.level,
+         snapshot=args.snapshot)
+
+
 if __name__ == '__main__':
-    main()
+    cli()